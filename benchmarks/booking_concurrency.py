@@ -0,0 +1,82 @@
+"""
+Fire many parallel bookings at a single training date and check that it is never oversold.
+
+    python -m benchmarks.booking_concurrency --requests 5000 --slots 500
+
+Runs against MONGO_URI, in the MONGO_DB_NAME database (defaults to a separate benchmark database).
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("MONGO_DB_NAME", "training_provider_benchmark")
+
+from bson import ObjectId  # noqa: E402
+from fastapi import BackgroundTasks, HTTPException  # noqa: E402
+
+from models.booking import BookingBase  # noqa: E402
+from routes.v1.bookings import create_booking  # noqa: E402
+from utils.database import bookings_collection, ensure_indexes, training_dates_collection  # noqa: E402
+
+
+async def book(training_date_id: ObjectId, index: int, user) -> int:
+    booking = BookingBase(training_date_id=training_date_id, customer_name=f"Customer {index}",
+                          customer_email=f"customer{index}@example.com")
+    try:
+        # The confirmation mails are never queued: background tasks only run after a real response
+        await create_booking(booking, BackgroundTasks(), user=user)
+        return 200
+    except HTTPException as e:
+        return e.status_code
+
+
+async def run(requests: int, slots: int, concurrency: int):
+    await ensure_indexes()
+    now = datetime.datetime.now(datetime.UTC)
+    result = await training_dates_collection.insert_one({
+        "training_id": ObjectId(), "start_date": now, "end_date": now + datetime.timedelta(hours=8),
+        "location": "Benchmark", "available_slots": slots, "created_at": now, "created_by": "benchmark",
+    })
+    training_date_id = result.inserted_id
+    user = SimpleNamespace(id="benchmark", email="benchmark@example.com", roles=["admin"])
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(index: int) -> int:
+        async with semaphore:
+            return await book(training_date_id, index, user)
+
+    started = time.perf_counter()
+    statuses = await asyncio.gather(*(limited(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    training_date = await training_dates_collection.find_one({"_id": result.inserted_id})
+    stored = await bookings_collection.count_documents({"training_date_id": training_date_id})
+    accepted = statuses.count(200)
+    oversold = max(0, stored - slots)
+
+    print(f"requests:        {requests} (concurrency {concurrency})")
+    print(f"accepted:        {accepted}")
+    print(f"rejected:        {requests - accepted}")
+    print(f"stored bookings: {stored} of {slots} slots")
+    print(f"slots left:      {training_date['available_slots']}")
+    print(f"oversold:        {oversold}")
+    print(f"elapsed:         {elapsed:.2f}s ({requests / elapsed:.0f} bookings/s)")
+
+    await bookings_collection.delete_many({"training_date_id": training_date_id})
+    await training_dates_collection.delete_one({"_id": result.inserted_id})
+
+    consistent = accepted == stored and stored + training_date["available_slots"] == slots
+    if oversold or not consistent:
+        raise SystemExit("Slot accounting is inconsistent")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000, help="Number of booking attempts")
+    parser.add_argument("--slots", type=int, default=500, help="Slots on the training date")
+    parser.add_argument("--concurrency", type=int, default=1000, help="Maximum bookings in flight")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.slots, args.concurrency))
@@ -0,0 +1,62 @@
+"""
+Measure bytes on the wire and encode CPU time of a bookings list page in every representation the API
+negotiates: JSON and MessagePack, each uncompressed, gzip and brotli compressed.
+
+    python -m benchmarks.encodings --bookings 10000
+
+Encoding runs the same functions as ContentNegotiationMiddleware, with GZIP_LEVEL and BROTLI_QUALITY from the
+settings. The synthetic rows repeat a lot, so real data compresses somewhat worse. Needs no database.
+"""
+import argparse
+import time
+
+from benchmarks.serialization import make_bookings
+from utils.encoding import compress, json_to_msgpack
+from utils.serialization import dumps
+
+
+def page_rows(count: int) -> list[dict]:
+    # What the bookings list pipeline returns: rows with the string id
+    rows = []
+    for row in make_bookings(count):
+        row["id"] = str(row.pop("_id"))
+        rows.append(row)
+    return rows
+
+
+def measure(func, rounds: int) -> tuple[bytes, float]:
+    """Best CPU time of `rounds` runs in milliseconds, and the output."""
+    timings = []
+    for _ in range(rounds):
+        started = time.process_time()
+        output = func()
+        timings.append(time.process_time() - started)
+    return output, min(timings) * 1000
+
+
+def run(count: int, rounds: int):
+    rows = page_rows(count)
+    json_body, json_ms = measure(lambda: dumps({"status": True, "data": rows, "next_cursor": None}), rounds)
+    msgpack_body, msgpack_ms = measure(lambda: json_to_msgpack(json_body), rounds)
+    representations = [("json", json_body, json_ms), ("msgpack", msgpack_body, json_ms + msgpack_ms)]
+
+    print(f"{count} bookings, best CPU time of {rounds} rounds, from rows to the bytes on the wire")
+    print(f"{'format':<16} {'bytes':>10} {'ratio':>7} {'encode ms':>10} {'MB/s':>8}")
+    for name, body, base_ms in representations:
+        for encoding in (None, "gzip", "br"):
+            if encoding:
+                output, encode_ms = measure(lambda: compress(body, encoding), rounds)
+            else:
+                output, encode_ms = body, 0.0
+            total_ms = base_ms + encode_ms
+            label = f"{name}+{encoding}" if encoding else name
+            print(f"{label:<16} {len(output):>10} {len(output) / len(json_body):7.3f} {total_ms:10.2f} "
+                  f"{len(json_body) / total_ms / 1000:8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, default=10000, help="Rows in the page")
+    parser.add_argument("--rounds", type=int, default=5, help="Repetitions, the best one is reported")
+    args = parser.parse_args()
+    run(args.bookings, args.rounds)
@@ -0,0 +1,43 @@
+"""
+In-memory stand-in for MongoDB (mongomock-motor), so the benchmark suite runs without a mongod.
+Call install() before anything imports utils.database. Timings against the stand-in only compare
+runs with each other; they say nothing about a real database.
+"""
+import motor.motor_asyncio
+
+
+def install():
+    try:
+        import mongomock_motor
+    except ImportError:
+        raise SystemExit("The in-memory stand-in needs mongomock-motor: pip install mongomock-motor")
+
+    class StandInClient(mongomock_motor.AsyncMongoMockClient):
+        def __init__(self, *args, event_listeners=None, **kwargs):
+            # Command monitoring does not exist in mongomock
+            super().__init__()
+
+    async def bulk_write(self, requests, ordered=True, **kwargs):
+        # mongomock cannot run the bulk operations of current pymongo versions, so replay them one by one
+        for request in requests:
+            kind = type(request).__name__
+            if kind == "InsertOne":
+                await self.insert_one(request._doc)
+            elif kind == "UpdateOne":
+                await self.update_one(request._filter, request._doc, upsert=request._upsert)
+            elif kind == "UpdateMany":
+                await self.update_many(request._filter, request._doc, upsert=request._upsert)
+            elif kind == "DeleteOne":
+                await self.delete_one(request._filter)
+            elif kind == "DeleteMany":
+                await self.delete_many(request._filter)
+            else:
+                raise NotImplementedError(f"{kind} is not supported by the in-memory stand-in")
+
+    def with_options(self, **kwargs):
+        # Read preference and read concern mean nothing to a single in-memory server
+        return self
+
+    mongomock_motor.AsyncMongoMockCollection.bulk_write = bulk_write
+    mongomock_motor.AsyncMongoMockCollection.with_options = with_options
+    motor.motor_asyncio.AsyncIOMotorClient = StandInClient
@@ -0,0 +1,216 @@
+"""
+Drive the API in-process (httpx ASGITransport, no network) with scripted scenarios and report latency,
+throughput and MongoDB commands per request, optionally against a stored baseline.
+
+    python -m benchmarks.load --requests 2000 --concurrency 50
+    python -m benchmarks.load --save-baseline benchmarks/baseline.json
+    python -m benchmarks.load --baseline benchmarks/baseline.json --tolerance 0.2
+    python -m benchmarks.load --in-memory
+
+Scenarios: browse (catalog pages and availability), book (a seat on a random date), login (password check) and
+my_bookings (a user's own bookings). Runs against MONGO_DB_NAME (a separate benchmark database by default), which
+should be seeded with `python -m benchmarks.seed` first; --in-memory seeds a small data set into the mongomock-motor
+stand-in instead. Exits with status 1 if a scenario regressed against the baseline.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+os.environ.setdefault("MONGO_DB_NAME", "training_provider_benchmark")
+
+from benchmarks import seed  # noqa: E402
+
+SCENARIOS = ("browse", "book", "login", "my_bookings")
+
+
+class Context:
+    """Ids and tokens the scenarios pick from, loaded once from the seeded data."""
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.training_ids = []
+        self.training_date_ids = []
+        self.user_emails = []
+        self.user_tokens = {}
+        self.bookings_made = 0
+
+    async def load(self, sample: int):
+        from routes.v1.auth import create_access_token
+        from utils.database import training_dates_collection, trainings_collection, users_collection
+
+        def pipeline(*stages):
+            return [*stages, {"$sample": {"size": sample}}, {"$project": {"_id": 1, "email": 1}}]
+
+        self.training_ids = [str(d["_id"]) async for d in trainings_collection.aggregate(pipeline())]
+        self.training_date_ids = [str(d["_id"]) async for d in training_dates_collection.aggregate(pipeline())]
+        async for user in users_collection.aggregate(pipeline({"$match": {"roles": "user"}})):
+            self.user_emails.append(user["email"])
+            self.user_tokens[user["email"]] = create_access_token({"sub": str(user["_id"])})
+        if not (self.training_ids and self.training_date_ids and self.user_emails):
+            raise SystemExit("The benchmark database is empty, run `python -m benchmarks.seed` first")
+
+    def user(self) -> tuple[str, dict]:
+        email = self.rng.choice(self.user_emails)
+        return email, {"Authorization": f"Bearer {self.user_tokens[email]}"}
+
+
+async def browse(client, context: Context):
+    await client.get("/api/v1/trainings/", params={"limit": 20})
+    await client.get("/api/v1/training-dates/", params={"training_id": context.rng.choice(context.training_ids),
+                                                        "limit": 20})
+    return await client.get("/api/v1/availability/", params={"start_date": "2025-03-01", "end_date": "2025-03-31",
+                                                             "granularity": "day", "limit": 100})
+
+
+async def book(client, context: Context):
+    _, headers = context.user()
+    context.bookings_made += 1
+    # A fresh customer each time, so the only expected rejection is a sold out date
+    customer = f"load-{os.getpid()}-{time.time_ns()}-{context.bookings_made}"
+    return await client.post("/api/v1/bookings/", headers=headers, json={
+        "training_date_id": context.rng.choice(context.training_date_ids), "customer_name": customer,
+        "customer_email": f"{customer}@example.com",
+    })
+
+
+async def login(client, context: Context):
+    return await client.post("/api/v1/auth/token", json={"email": context.rng.choice(context.user_emails),
+                                                         "password": seed.BENCHMARK_PASSWORD})
+
+
+async def my_bookings(client, context: Context):
+    _, headers = context.user()
+    return await client.get("/api/v1/bookings/", headers=headers, params={"limit": 50})
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run_scenario(client, context: Context, scenario, requests: int, concurrency: int) -> dict:
+    from utils.metrics import mongodb_command_duration
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await scenario(client, context)
+            latencies.append((time.perf_counter() - started) * 1000)
+            # 400 is a valid answer: the book scenario may pick a sold out date
+            if response.status_code not in (200, 400):
+                errors += 1
+
+    commands_before = mongodb_command_duration.count()
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    commands = mongodb_command_duration.count() - commands_before
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput": requests / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        # Command monitoring only sees a real server
+        "mongo_ops_per_request": commands / requests if commands else None,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        if result["p95_ms"] > before["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.1f} -> {result['p95_ms']:.1f} ms")
+        if result["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before['throughput']:.0f} -> {result['throughput']:.0f} req/s")
+    return regressions
+
+
+def report(results: dict, baseline: dict):
+    print(f"{'scenario':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ops/req':>8} {'errors':>7}"
+          + ("   p95 vs baseline" if baseline else ""))
+    for name, r in results.items():
+        ops = f"{r['mongo_ops_per_request']:.1f}" if r["mongo_ops_per_request"] is not None else "-"
+        line = (f"{name:<12} {r['throughput']:8.0f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['p99_ms']:8.2f} "
+                f"{ops:>8} {r['errors']:7d}")
+        if baseline.get(name):
+            line += f"   {(r['p95_ms'] / baseline[name]['p95_ms'] - 1) * 100:+.0f}%"
+        print(line)
+
+
+async def run(args):
+    import httpx
+
+    from limiter import limiter
+    from main import app
+
+    # The per-route limits would otherwise reject most of the load as coming from one client
+    limiter.enabled = False
+    # One log line per request would measure the console rather than the API
+    for name in ("api.requests", "httpx"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+    if args.in_memory:
+        await seed.seed(args.users, args.trainings, args.dates, args.bookings, args.batch_size, args.parallel,
+                        args.seed, drop=True)
+
+    context = Context(random.Random(args.seed))
+    results = {}
+    async with app.router.lifespan_context(app):
+        await context.load(args.sample)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for name in args.scenarios:
+                scenario = globals()[name]
+                # Warm up caches and pools so the first requests do not skew the percentiles
+                await run_scenario(client, context, scenario, min(args.requests, 20), args.concurrency)
+                results[name] = await run_scenario(client, context, scenario, args.requests, args.concurrency)
+
+    baseline = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"baseline written to {args.save_baseline}")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("regressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight")
+    parser.add_argument("--sample", type=int, default=1000, help="Seeded ids and users the scenarios pick from")
+    parser.add_argument("--baseline", help="Compare with this baseline file")
+    parser.add_argument("--save-baseline", help="Write the results to this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    parser.add_argument("--in-memory", action="store_true", help="Use the in-memory stand-in instead of MongoDB")
+    # Volumes seeded into the in-memory stand-in; also the random seed of the scenarios
+    seed.add_arguments(parser, users=200, trainings=100, dates=1000, bookings=5000)
+    args = parser.parse_args()
+    if args.in_memory:
+        from benchmarks.in_memory import install
+
+        install()
+    asyncio.run(run(args))
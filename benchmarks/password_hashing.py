@@ -0,0 +1,69 @@
+"""
+Measure latency of non-auth GETs while password hashes are in flight, with argon2 run inline on
+the event loop (the old behaviour) and in the password hashing pool.
+
+    python -m benchmarks.password_hashing --logins 64 --probes 200
+
+Needs no database: the probes call /api/openapi.json through httpx's ASGITransport.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from main import app
+from services.password_service import hash_password, hash_password_sync, password_hasher
+
+
+async def inline_hash(password: str) -> str:
+    return hash_password_sync(password)
+
+
+async def probe(client: httpx.AsyncClient, probes: int) -> list[float]:
+    latencies = []
+    for _ in range(probes):
+        started = time.perf_counter()
+        response = await client.get("/api/openapi.json")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+        await asyncio.sleep(0.001)
+    return latencies
+
+
+async def scenario(client: httpx.AsyncClient, hasher, logins: int, probes: int) -> list[float]:
+    async def login(index: int):
+        await hasher(f"password-{index}")
+
+    probe_task = asyncio.create_task(probe(client, probes))
+    await asyncio.gather(*(login(i) for i in range(logins)))
+    return await probe_task
+
+
+def report(name: str, latencies: list[float]):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name:<8} p50 {statistics.median(latencies):8.2f} ms   p99 {p99:8.2f} ms   max {latencies[-1]:8.2f} ms")
+
+
+async def run(logins: int, probes: int):
+    password_hasher.max_queue = max(password_hasher.max_queue, logins)
+    password_hasher.start()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        await client.get("/api/openapi.json")
+        await hash_password("warm up the pool")
+        print(f"{logins} concurrent logins, {probes} GETs, {password_hasher.workers} hashing workers")
+        report("idle", await probe(client, probes))
+        report("inline", await scenario(client, inline_hash, logins, probes))
+        report("pool", await scenario(client, hash_password, logins, probes))
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64, help="Password hashes in flight")
+    parser.add_argument("--probes", type=int, default=200, help="GET requests measured per scenario")
+    args = parser.parse_args()
+    asyncio.run(run(args.logins, args.probes))
@@ -0,0 +1,157 @@
+"""
+Seed a database with realistic volumes of synthetic users, trainings, training dates and bookings.
+
+    python -m benchmarks.seed --trainings 100000 --dates 1000000 --bookings 10000000
+
+Writes to MONGO_DB_NAME (a separate benchmark database by default) with unordered bulk inserts, then creates the
+indexes and builds the availability rollup. The same --seed gives the same data. Every user has the password
+`benchmark-password`; benchmark-admin@example.com is an admin, benchmark-user-<n>@example.com are regular users.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import time
+
+os.environ.setdefault("MONGO_DB_NAME", "training_provider_benchmark")
+
+from bson import ObjectId  # noqa: E402
+
+BENCHMARK_PASSWORD = "benchmark-password"
+ADMIN_EMAIL = "benchmark-admin@example.com"
+EPOCH = datetime.datetime(2025, 1, 1)
+DAYS = 3 * 365
+LOCATIONS = ("Online", "Berlin", "Hamburg", "Munich", "Vienna", "Zurich", "London", "Amsterdam")
+TOPICS = ("Python", "FastAPI", "MongoDB", "Kubernetes", "Security", "Leadership", "Agile", "Data Science")
+
+
+def user_email(index: int) -> str:
+    return f"benchmark-user-{index}@example.com"
+
+
+class Writer:
+    """Runs up to `parallel` insert_many calls at a time."""
+
+    def __init__(self, parallel: int):
+        self.semaphore = asyncio.Semaphore(parallel)
+        self.pending = set()
+        self.inserted = 0
+
+    async def insert(self, collection, documents: list):
+        await self.semaphore.acquire()
+
+        async def write():
+            try:
+                await collection.insert_many(documents, ordered=False)
+                self.inserted += len(documents)
+            finally:
+                self.semaphore.release()
+
+        task = asyncio.create_task(write())
+        self.pending.add(task)
+        task.add_done_callback(self.pending.discard)
+
+    async def flush(self):
+        await asyncio.gather(*self.pending)
+
+
+async def seed(users: int, trainings: int, dates: int, bookings: int, batch_size: int, parallel: int, seed: int,
+               drop: bool):
+    from migrations import run_migrations
+    from services.password_service import hash_password_sync
+    from utils.database import (bookings_collection, ensure_indexes, training_dates_collection,
+                                trainings_collection, users_collection)
+
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    if drop:
+        for collection in (users_collection, trainings_collection, training_dates_collection, bookings_collection):
+            await collection.drop()
+    writer = Writer(parallel)
+    now = datetime.datetime.now(datetime.UTC)
+
+    # One hash for every user; argon2 is far too slow to run millions of times
+    password = hash_password_sync(BENCHMARK_PASSWORD)
+    await writer.insert(users_collection, [{"email": ADMIN_EMAIL, "password": password, "roles": ["admin"],
+                                            "permissions": [], "created_at": now}])
+    for offset in range(0, users, batch_size):
+        await writer.insert(users_collection, [
+            {"email": user_email(i), "password": password, "roles": ["user"], "permissions": [], "created_at": now}
+            for i in range(offset, min(users, offset + batch_size))
+        ])
+
+    training_ids = []
+    max_participants = {}
+    for offset in range(0, trainings, batch_size):
+        batch = []
+        for i in range(offset, min(trainings, offset + batch_size)):
+            training_id = ObjectId()
+            training_ids.append(training_id)
+            max_participants[training_id] = rng.choice((10, 20, 30, 40))
+            batch.append({
+                "_id": training_id, "name": f"{rng.choice(TOPICS)} training {i}",
+                "description": "Seeded by benchmarks.seed", "price": float(rng.randrange(100, 3000, 50)),
+                "instructor": f"Instructor {i % 500}", "duration_hours": float(rng.choice((4, 8, 16, 24))),
+                "max_participants": max_participants[training_id], "created_at": now, "created_by": "benchmark",
+            })
+        await writer.insert(trainings_collection, batch)
+
+    # Bookings are spread over the dates so that every date stays within its training's capacity
+    per_date = bookings / dates if dates else 0
+    booked = 0
+    date_batch, booking_batch = [], []
+    for _ in range(dates):
+        training_id = rng.choice(training_ids)
+        capacity = max_participants[training_id]
+        count = min(capacity, users, round(rng.uniform(0, 2 * per_date)))
+        start = EPOCH + datetime.timedelta(days=rng.randrange(DAYS), hours=rng.randrange(8, 12))
+        training_date_id = ObjectId()
+        date_batch.append({
+            "_id": training_date_id, "training_id": training_id, "start_date": start,
+            "end_date": start + datetime.timedelta(days=rng.randint(1, 3)), "location": rng.choice(LOCATIONS),
+            "available_slots": capacity - count, "created_at": now, "created_by": "benchmark",
+        })
+        for customer in rng.sample(range(users), count):
+            booking_batch.append({
+                "training_date_id": training_date_id, "customer_name": f"Customer {customer}",
+                "customer_email": user_email(customer), "created_at": now, "created_by": "benchmark",
+                "status": "confirmed",
+            })
+        booked += count
+        if len(date_batch) >= batch_size:
+            await writer.insert(training_dates_collection, date_batch)
+            date_batch = []
+        while len(booking_batch) >= batch_size:
+            await writer.insert(bookings_collection, booking_batch[:batch_size])
+            booking_batch = booking_batch[batch_size:]
+    for collection, batch in ((training_dates_collection, date_batch), (bookings_collection, booking_batch)):
+        if batch:
+            await writer.insert(collection, batch)
+    await writer.flush()
+    print(f"inserted {users + 1} users, {trainings} trainings, {dates} training dates and {booked} bookings "
+          f"({writer.inserted / (time.perf_counter() - started):.0f} docs/s)")
+
+    # Building the indexes once after loading is faster than maintaining them during the inserts
+    await ensure_indexes()
+    await run_migrations(batch_size)
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+
+def add_arguments(parser: argparse.ArgumentParser, users: int, trainings: int, dates: int, bookings: int):
+    parser.add_argument("--users", type=int, default=users, help="Regular users to seed")
+    parser.add_argument("--trainings", type=int, default=trainings, help="Trainings to seed")
+    parser.add_argument("--dates", type=int, default=dates, help="Training dates to seed")
+    parser.add_argument("--bookings", type=int, default=bookings, help="Bookings to seed, about")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Documents per insert_many")
+    parser.add_argument("--parallel", type=int, default=4, help="Inserts in flight")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser, users=100_000, trainings=100_000, dates=1_000_000, bookings=10_000_000)
+    parser.add_argument("--drop", action="store_true", help="Drop the seeded collections first")
+    args = parser.parse_args()
+    asyncio.run(seed(args.users, args.trainings, args.dates, args.bookings, args.batch_size, args.parallel,
+                     args.seed, args.drop))
@@ -0,0 +1,89 @@
+"""
+Compare serializing a page of bookings the old way (convert_objectid_to_str, id swap, response model
+validation, json.dumps) with the fast path (ids converted by the query, orjson on the raw rows).
+
+    python -m benchmarks.serialization --bookings 10000
+
+Needs no database.
+"""
+import argparse
+import datetime
+import json
+import time
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+from models.response import BookingListResponse
+from utils.helper import convert_objectid_to_str
+from utils.serialization import FastJSONResponse
+
+
+def make_bookings(count: int) -> list[dict]:
+    now = datetime.datetime(2025, 1, 1, 9, 0, 0, 123000)
+    training_date_id = str(ObjectId())
+    return [{
+        "_id": ObjectId(),
+        "training_date_id": training_date_id,
+        "customer_name": f"Customer {i}",
+        "customer_email": f"customer{i}@example.com",
+        "customer_phone": "+1234567890",
+        "notes": "Vegetarian lunch",
+        "created_at": now + datetime.timedelta(seconds=i),
+        "created_by": training_date_id,
+        "status": "confirmed",
+    } for i in range(count)]
+
+
+def old_path(rows: list[dict]) -> bytes:
+    bookings = [convert_objectid_to_str(row) for row in rows]
+    for booking in bookings:
+        booking["id"] = convert_objectid_to_str(booking["_id"])
+        del booking["_id"]
+    content = BookingListResponse.model_validate({"status": True, "data": bookings}).model_dump(mode="json")
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def new_path(rows: list[dict]) -> bytes:
+    return FastJSONResponse({"status": True, "data": rows, "next_cursor": None}).body
+
+
+def measure(name: str, func, rows_factory, rounds: int):
+    timings = []
+    for _ in range(rounds):
+        rows = rows_factory()
+        started = time.perf_counter()
+        body = func(rows)
+        timings.append(time.perf_counter() - started)
+    best = min(timings) * 1000
+    print(f"{name:<5} best {best:8.2f} ms   {len(body):>9} bytes")
+    return best
+
+
+def run(count: int, rounds: int):
+    raw = make_bookings(count)
+
+    def old_rows():
+        return [dict(row) for row in raw]
+
+    def new_rows():
+        # What the $toString pipeline returns: the string id instead of _id
+        rows = []
+        for row in raw:
+            row = dict(row)
+            row["id"] = str(row.pop("_id"))
+            rows.append(row)
+        return rows
+
+    print(f"{count} bookings, best of {rounds} rounds")
+    old = measure("old", old_path, old_rows, rounds)
+    new = measure("new", new_path, new_rows, rounds)
+    print(f"speedup {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--bookings", type=int, default=10000, help="Bookings in the page")
+    parser.add_argument("--rounds", type=int, default=5, help="Repetitions, the best one is reported")
+    args = parser.parse_args()
+    run(args.bookings, args.rounds)
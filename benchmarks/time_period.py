@@ -0,0 +1,109 @@
+"""
+Compare the old /trainings/time-period aggregation ($toObjectId, $lookup and $group before $limit)
+with the index-backed overlap query.
+
+    python -m benchmarks.time_period --dates 1000000 --trainings 1000
+
+Seeds the training dates once into MONGO_DB_NAME (a separate benchmark database by default) and
+reuses them on later runs unless --reseed is given. The old query is timed the way it ran before, with no
+index on training_dates but _id, so the benchmark drops them first and creates them again for the new one.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("MONGO_DB_NAME", "training_provider_benchmark")
+
+from routes.v1.trainings import find_trainings_in_period  # noqa: E402
+from utils.database import ensure_indexes, training_dates_collection, trainings_collection  # noqa: E402
+
+EPOCH = datetime.datetime(2025, 1, 1)
+DAYS = 3 * 365
+
+
+def old_pipeline(start_date: datetime.datetime, end_date: datetime.datetime, limit: int) -> list:
+    return [
+        {"$match": {"start_date": {"$gte": start_date}, "end_date": {"$lte": end_date}}},
+        {"$project": {"training_id": 1, "start_date": 1, "end_date": 1}},
+        {"$addFields": {"training_id": {"$cond": {
+            "if": {"$eq": [{"$type": "$training_id"}, "string"]},
+            "then": {"$toObjectId": "$training_id"},
+            "else": "$training_id",
+        }}}},
+        {"$lookup": {"from": "trainings", "localField": "training_id", "foreignField": "_id", "as": "training"}},
+        {"$unwind": {"path": "$training", "preserveNullAndEmptyArrays": True}},
+        {"$replaceRoot": {"newRoot": "$training"}},
+        {"$group": {"_id": "$_id", "name": {"$first": "$name"}, "price": {"$first": "$price"}}},
+        {"$limit": limit},
+    ]
+
+
+async def seed(trainings: int, dates: int, batch_size: int = 10000):
+    await trainings_collection.delete_many({"created_by": "benchmark"})
+    await training_dates_collection.delete_many({"created_by": "benchmark"})
+    training_ids = (await trainings_collection.insert_many([{
+        "name": f"Benchmark training {i}", "description": "Seeded by benchmarks.time_period", "price": 100.0,
+        "instructor": f"Instructor {i % 50}", "duration_hours": 8, "max_participants": 10,
+        "created_at": EPOCH, "created_by": "benchmark",
+    } for i in range(trainings)])).inserted_ids
+
+    started = time.perf_counter()
+    for offset in range(0, dates, batch_size):
+        batch = []
+        for _ in range(min(batch_size, dates - offset)):
+            start = EPOCH + datetime.timedelta(days=random.randrange(DAYS), hours=random.randrange(8, 12))
+            batch.append({
+                "training_id": random.choice(training_ids), "start_date": start,
+                "end_date": start + datetime.timedelta(days=random.randint(1, 3)), "location": "Online",
+                "available_slots": 10, "created_at": EPOCH, "created_by": "benchmark",
+            })
+        await training_dates_collection.insert_many(batch, ordered=False)
+    print(f"seeded {dates} training dates in {time.perf_counter() - started:.1f}s")
+
+
+async def timed(query, windows) -> list[float]:
+    timings = []
+    for start_date, end_date in windows:
+        started = time.perf_counter()
+        await query(start_date, end_date)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def run(trainings: int, dates: int, window_days: int, queries: int, limit: int, reseed: bool):
+    if reseed or await training_dates_collection.count_documents({"created_by": "benchmark"}) != dates:
+        await seed(trainings, dates)
+
+    windows = []
+    for _ in range(queries):
+        start = EPOCH + datetime.timedelta(days=random.randrange(DAYS - window_days))
+        windows.append((start, start + datetime.timedelta(days=window_days)))
+
+    async def old(start_date, end_date):
+        return await training_dates_collection.aggregate(old_pipeline(start_date, end_date, limit)).to_list(limit)
+
+    async def new(start_date, end_date):
+        return await find_trainings_in_period(start_date, end_date, limit)
+
+    print(f"{dates} training dates, {trainings} trainings, {queries} queries over {window_days}-day windows")
+    variants = (("before", old, training_dates_collection.drop_indexes), ("after", new, ensure_indexes))
+    for name, query, prepare in variants:
+        await prepare()
+        timings = await timed(query, windows)
+        print(f"{name:<7} median {statistics.median(timings):9.1f} ms   max {max(timings):9.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dates", type=int, default=1_000_000, help="Training dates to seed")
+    parser.add_argument("--trainings", type=int, default=1000, help="Trainings to seed")
+    parser.add_argument("--window-days", type=int, default=30, help="Length of the queried period")
+    parser.add_argument("--queries", type=int, default=20, help="Queries per variant")
+    parser.add_argument("--limit", type=int, default=100, help="Limit passed to the query")
+    parser.add_argument("--reseed", action="store_true", help="Drop and seed the benchmark data again")
+    args = parser.parse_args()
+    asyncio.run(run(args.trainings, args.dates, args.window_days, args.queries, args.limit, args.reseed))
@@ -0,0 +1,118 @@
+"""
+Measure refresh token checks with millions of revoked tokens stored, asking the database on every check
+(no filter) and through the in-memory revocation filter.
+
+    python -m benchmarks.token_revocation --revoked 10000000 --refreshes 20000
+
+Seeds the revoked tokens once into MONGO_DB_NAME (a separate benchmark database by default) and
+reuses them on later runs unless --reseed is given.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import statistics
+import time
+import uuid
+
+os.environ.setdefault("MONGO_DB_NAME", "training_provider_benchmark")
+
+from fastapi import HTTPException  # noqa: E402
+
+from routes.v1.auth import create_refresh_token  # noqa: E402
+from services.token_service import check_refresh_token, revocation_list, revoke_refresh_token  # noqa: E402
+from utils.database import ensure_indexes, tokens_collection  # noqa: E402
+
+
+async def seed(revoked: int, batch_size: int = 10000):
+    await tokens_collection.delete_many({})
+    now = datetime.datetime.now(datetime.UTC)
+    expires_at = now + datetime.timedelta(days=7)
+    started = time.perf_counter()
+    for offset in range(0, revoked, batch_size):
+        await tokens_collection.insert_many([
+            {"_id": uuid.uuid4().hex, "expires_at": expires_at, "revoked_at": now}
+            for _ in range(min(batch_size, revoked - offset))
+        ], ordered=False)
+    print(f"seeded {revoked} revoked tokens in {time.perf_counter() - started:.1f}s")
+
+
+async def refresh_all(tokens: list[str], concurrency: int) -> tuple[float, list[float]]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def refresh(token: str):
+        async with semaphore:
+            started = time.perf_counter()
+            await check_refresh_token(token)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(refresh(token) for token in tokens))
+    return time.perf_counter() - started, latencies
+
+
+async def load_filter() -> tuple[float, float]:
+    """
+    Build the revocation filter. Returns the longest time the event loop went without running other tasks
+    and the total of such stalls over 10 ms, both in seconds.
+    """
+    stalls = []
+
+    async def probe():
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls.append(time.perf_counter() - started - 0.001)
+
+    task = asyncio.create_task(probe())
+    try:
+        await revocation_list.load()
+    finally:
+        task.cancel()
+    return max(stalls, default=0.0), sum(stall for stall in stalls if stall > 0.01)
+
+
+def report(name: str, elapsed: float, latencies: list[float]):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name:<10} {len(latencies) / elapsed:8.0f} refreshes/s   p50 {statistics.median(latencies):7.2f} ms"
+          f"   p99 {p99:7.2f} ms")
+
+
+async def run(revoked: int, refreshes: int, concurrency: int, reseed: bool):
+    if reseed or await tokens_collection.estimated_document_count() < revoked:
+        await seed(revoked)
+    await ensure_indexes()
+
+    tokens = [create_refresh_token({"sub": f"benchmark-{i}"}) for i in range(refreshes)]
+
+    revocation_list.filter = None
+    report("no filter", *await refresh_all(tokens, concurrency))
+
+    started = time.perf_counter()
+    longest, blocked = await load_filter()
+    print(f"filter built in {time.perf_counter() - started:.1f}s, {len(revocation_list.filter.bits) / 2 ** 20:.1f} MiB, "
+          f"event loop blocked {blocked:.1f}s in total, at most {longest * 1000:.0f} ms at once")
+    report("filter", *await refresh_all(tokens, concurrency))
+
+    # A revoked token must still be rejected
+    await revoke_refresh_token(tokens[0])
+    try:
+        await check_refresh_token(tokens[0])
+    except HTTPException:
+        pass
+    else:
+        raise SystemExit("Revoked token was accepted")
+    stats = revocation_list.stats()
+    print(f"database lookups {stats['lookups']}, skipped {stats['skipped_lookups']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--revoked", type=int, default=10_000_000, help="Revoked tokens to seed")
+    parser.add_argument("--refreshes", type=int, default=20000, help="Refresh token checks per variant")
+    parser.add_argument("--concurrency", type=int, default=100, help="Maximum checks in flight")
+    parser.add_argument("--reseed", action="store_true", help="Drop and seed the revoked tokens again")
+    args = parser.parse_args()
+    asyncio.run(run(args.revoked, args.refreshes, args.concurrency, args.reseed))
@@ -1,7 +1,42 @@
+from jose import JWTError
 from slowapi import Limiter
 from slowapi.util import get_remote_address
+from starlette.requests import Request
 
 from utils.config import settings
+from utils.token_decoder import access_tokens
+
+
+def rate_limit_key(request: Request) -> str:
+    """Limit authenticated callers per user, everyone else per client IP."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            payload = access_tokens.decode_request(request, token)
+            if payload.get("sub"):
+                return f"user:{payload['sub']}"
+        except JWTError:
+            pass
+    return f"ip:{get_remote_address(request)}"
+
+
+def create_limiter(storage_uri: str = settings.RATE_LIMIT_STORAGE_URI,
+                   default_limits: list[str] = (settings.ACCESS_LIMIT,), **storage_options) -> Limiter:
+    """
+    Counters live in the storage, Redis by default, so the limits hold across workers; if it is unreachable
+    each worker falls back to in-memory counters until it is back. `storage_options` go to the storage client.
+    """
+    return Limiter(
+        key_func=rate_limit_key,
+        default_limits=list(default_limits),
+        storage_uri=storage_uri,
+        strategy=settings.RATE_LIMIT_STRATEGY,
+        in_memory_fallback_enabled=True,
+        # Fail over quickly instead of holding requests when Redis hangs
+        storage_options={"socket_connect_timeout": 0.5, "socket_timeout": 0.5, **storage_options},
+        key_prefix="training_provider",
+    )
+
 
 # Create a single Limiter instance for the entire app
-limiter = Limiter(key_func=get_remote_address, default_limits=[settings.ACCESS_LIMIT])
+limiter = create_limiter()
@@ -5,23 +5,30 @@ from contextlib import asynccontextmanager
 import uvicorn
 from fastapi import FastAPI, HTTPException, Request, APIRouter
 from fastapi.openapi.utils import get_openapi
-from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
-from slowapi.util import get_remote_address
 from starlette.middleware.cors import CORSMiddleware
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, PlainTextResponse
 
+from limiter import limiter
+from migrations import pending_migrations
 from models.role import RoleBase
-from routes.v1 import auth, trainings, training_dates, bookings
+from routes.v1 import auth, trainings, training_dates, bookings, admin, availability
+from services.email_service import email_worker
+from services.password_service import password_hasher
+from services.slot_feed import slot_feed
+from services.token_service import revocation_list
 from utils.config import settings
-from utils.database import roles_collection
+from utils.database import client, roles_collection, ensure_indexes
+from utils.encoding import ContentNegotiationMiddleware
 from utils.exception_handler import global_exception_handler, http_exception_handler
-from utils.logging_config import setup_logging
+from utils.logging_config import setup_logging, stop_logging
+from utils.metrics import rate_limit_rejections, render as render_metrics
+from utils.permissions import role_table
+from utils.request_context import RequestContextMiddleware, route_template
 
 setup_logging()
 logger = logging.getLogger(__name__)
-limiter = Limiter(key_func=get_remote_address, default_limits=[settings.ACCESS_LIMIT])
 
 initial_roles = [
     RoleBase(name="admin", permissions=["read", "create", "update", "delete", "read_training", "manage_booking"]),
@@ -31,12 +38,33 @@ initial_roles = [
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # No-op unless a previous shutdown stopped the log listener
+    setup_logging()
     if await roles_collection.count_documents({}) == 0:
         await roles_collection.insert_many([role.dict() for role in initial_roles])
         logger.info("[FastAPI] Initial roles seeded.")
     else:
         logger.info("[FastAPI] Roles already exist, skipping seed.")
+    await ensure_indexes()
+    pending = await pending_migrations()
+    if pending:
+        logger.warning(f"[FastAPI] {len(pending)} database migration(s) pending, run `python migrate.py`.")
+    await role_table.load()
+    role_watcher = asyncio.create_task(role_table.watch())
+    revocation_watcher = asyncio.create_task(revocation_list.watch())
+    slot_watcher = asyncio.create_task(slot_feed.watch())
+    password_hasher.start()
+    email_worker.start()
     yield
+    await email_worker.stop()
+    role_watcher.cancel()
+    revocation_watcher.cancel()
+    slot_watcher.cancel()
+    password_hasher.shutdown()
+    # Last user of the database is gone: close the pooled connections instead of leaving them to the server
+    client.close()
+    logger.info("[FastAPI] MongoDB connections closed.")
+    stop_logging()
 
 
 app = FastAPI(
@@ -73,7 +101,6 @@ app.openapi = custom_openapi
 app.add_exception_handler(Exception, global_exception_handler)
 app.add_exception_handler(HTTPException, http_exception_handler)
 app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 app.add_middleware(SlowAPIMiddleware)
 
 allowed_origins = [
@@ -93,16 +120,22 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Encodes every response, including rate limit and CORS rejections
+app.add_middleware(ContentNegotiationMiddleware)
+# Outermost, so the request id and latency cover everything, including CORS, rate limiting and encoding
+app.add_middleware(RequestContextMiddleware)
 
 
-# Custom exception handler (optional)
+# Custom exception handler (optional). Synchronous, because SlowAPIMiddleware, which enforces the
+# default limits, falls back to slowapi's own handler for coroutines
 @app.exception_handler(RateLimitExceeded)
-async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
+def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded):
     content = f"Rate limit exceeded. {exc.detail}. Try again later."
-    logger.error(content, exc_info=True)
+    rate_limit_rejections.inc(route_template(request.scope))
+    logger.warning(content)
     return JSONResponse(
         status_code=429,
-        content={"detail": content},
+        content={"message": content},
     )
 
 
@@ -112,15 +145,27 @@ root_router.include_router(auth.router, prefix="/v1")
 root_router.include_router(trainings.router, prefix="/v1")
 root_router.include_router(training_dates.router, prefix="/v1")
 root_router.include_router(bookings.router, prefix="/v1")
+root_router.include_router(availability.router, prefix="/v1")
+root_router.include_router(admin.router, prefix="/v1")
 
 
 @root_router.get("/")
-@limiter.limit("5/minute")  # Limit to 5 requests per minute per IP
+@limiter.limit("5/minute")  # Limit to 5 requests per minute per user or IP
 async def root(request: Request):
     return {"message": "Hello, to Training Provider API!"}
 
 
+@root_router.get("/metrics", include_in_schema=False)
+@limiter.exempt
+async def metrics(request: Request):
+    """
+    Metrics of this worker in the Prometheus text format.
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 app.include_router(root_router)
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # log_config=None keeps the queued logging set up by setup_logging()
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)
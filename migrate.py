@@ -0,0 +1,27 @@
+import argparse
+import asyncio
+import logging
+
+from migrations import MIGRATIONS, applied_versions, run_migrations
+from utils.logging_config import setup_logging
+
+setup_logging()
+logger = logging.getLogger(__name__)
+
+
+async def list_migrations():
+    applied = await applied_versions()
+    for migration in MIGRATIONS:
+        status = "applied" if migration.VERSION in applied else "pending"
+        print(f"{migration.VERSION}  {migration.NAME:<40} {status}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply pending database migrations.")
+    parser.add_argument("--list", action="store_true", help="Show all migrations and whether they are applied")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Documents converted per bulk write")
+    args = parser.parse_args()
+    if args.list:
+        asyncio.run(list_migrations())
+    else:
+        asyncio.run(run_migrations(args.batch_size))
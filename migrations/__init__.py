@@ -0,0 +1,72 @@
+import datetime
+import logging
+import time
+
+from pymongo import ReturnDocument
+
+from utils.database import maintenance_timeout, migrations_collection
+from migrations import (m0001_normalize_reference_ids, m0002_build_availability_rollup, m0003_key_revoked_tokens,
+                        m0004_check_session_lengths)
+
+logger = logging.getLogger(__name__)
+
+# Every migration module exposes VERSION, NAME and `async def up(state, batch_size)`, in order of VERSION
+MIGRATIONS = [
+    m0001_normalize_reference_ids,
+    m0002_build_availability_rollup,
+    m0003_key_revoked_tokens,
+    m0004_check_session_lengths,
+]
+
+
+class MigrationState:
+    """Progress of one migration, persisted in the migrations collection so an interrupted run can resume."""
+
+    def __init__(self, document: dict):
+        self.version = document["_id"]
+        self.checkpoints = document.get("checkpoints", {})
+        self.processed = 0
+        self.started = time.perf_counter()
+
+    async def checkpoint(self, key: str, value, processed: int):
+        self.checkpoints[key] = value
+        self.processed += processed
+        await migrations_collection.update_one({"_id": self.version}, {"$set": {f"checkpoints.{key}": value}})
+        elapsed = time.perf_counter() - self.started
+        logger.info(f"[Migrations] {self.version}: {self.processed} documents processed "
+                    f"({self.processed / elapsed if elapsed else 0:.0f} docs/s)")
+
+    async def skip(self, key: str, ids: list):
+        """Record documents the migration had to leave as they are, so they can be resolved by hand."""
+        await migrations_collection.update_one({"_id": self.version}, {"$addToSet": {f"skipped.{key}": {"$each": ids}}})
+
+
+async def applied_versions() -> set:
+    return {m["_id"] async for m in migrations_collection.find({"status": "done"}, {"_id": 1})}
+
+
+async def pending_migrations() -> list:
+    applied = await applied_versions()
+    return [migration for migration in MIGRATIONS if migration.VERSION not in applied]
+
+
+async def run_migrations(batch_size: int):
+    for migration in await pending_migrations():
+        document = await migrations_collection.find_one_and_update(
+            {"_id": migration.VERSION},
+            {"$set": {"name": migration.NAME, "status": "running"},
+             "$setOnInsert": {"started_at": datetime.datetime.now(datetime.UTC), "checkpoints": {}}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        state = MigrationState(document)
+        logger.info(f"[Migrations] Running {migration.VERSION} {migration.NAME}"
+                    + (" (resuming)" if state.checkpoints else ""))
+        with maintenance_timeout():
+            await migration.up(state, batch_size)
+        await migrations_collection.update_one(
+            {"_id": migration.VERSION},
+            {"$set": {"status": "done", "finished_at": datetime.datetime.now(datetime.UTC)}},
+        )
+        elapsed = time.perf_counter() - state.started
+        logger.info(f"[Migrations] {migration.VERSION} done: {state.processed} documents in {elapsed:.1f}s")
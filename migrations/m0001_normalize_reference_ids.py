@@ -0,0 +1,64 @@
+"""
+Store training_dates.training_id and bookings.training_date_id as ObjectIds instead of strings,
+so lookups and joins on them can use the _id index of the referenced collection.
+"""
+import logging
+
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from utils.database import bookings_collection, training_dates_collection
+
+logger = logging.getLogger(__name__)
+
+VERSION = "0001"
+NAME = "normalize_reference_ids"
+
+
+async def convert(state, collection, field: str, batch_size: int):
+    last_id = state.checkpoints.get(collection.name)
+    while True:
+        query = {field: {"$type": "string"}}
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        batch = await collection.find(query, {field: 1}).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            return
+
+        documents = [document for document in batch if ObjectId.is_valid(document[field])]
+        skipped = len(batch) - len(documents)
+        if skipped:
+            logger.warning(f"[Migrations] {skipped} {collection.name} documents have an invalid {field}, left as is")
+        if documents:
+            await update(state, collection, field, documents)
+
+        last_id = batch[-1]["_id"]
+        await state.checkpoint(collection.name, last_id, len(batch))
+
+
+async def update(state, collection, field: str, documents: list):
+    requests = [
+        # Matching the old value keeps a concurrent write to the document from being overwritten
+        UpdateOne({"_id": document["_id"], field: document[field]}, {"$set": {field: ObjectId(document[field])}})
+        for document in documents
+    ]
+    try:
+        await collection.bulk_write(requests, ordered=False)
+    except BulkWriteError as error:
+        errors = error.details["writeErrors"]
+        if any(write_error["code"] != 11000 for write_error in errors):
+            raise
+        # The converted value collides with a document that already stores it as an ObjectId, e.g. a booking
+        # of the same customer for the same date. Which one to keep is not ours to decide, so leave it and
+        # record it; the rest of the unordered batch has been written.
+        ids = [documents[write_error["index"]]["_id"] for write_error in errors]
+        logger.warning(f"[Migrations] {len(ids)} {collection.name} documents would duplicate a unique key once "
+                       f"{field} is an ObjectId, left as is and recorded under skipped.{collection.name}: "
+                       + ", ".join(str(_id) for _id in ids[:20]))
+        await state.skip(collection.name, ids)
+
+
+async def up(state, batch_size: int):
+    await convert(state, training_dates_collection, "training_id", batch_size)
+    await convert(state, bookings_collection, "training_date_id", batch_size)
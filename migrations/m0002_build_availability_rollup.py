@@ -0,0 +1,34 @@
+"""
+Build the availability rollup from the existing training dates. Run it before serving traffic:
+training dates written while it runs would be counted twice.
+"""
+from services.availability_service import rollup_updates
+from utils.database import availability_collection, training_dates_collection, trainings_collection
+
+VERSION = "0002"
+NAME = "build_availability_rollup"
+
+
+async def up(state, batch_size: int):
+    last_id = state.checkpoints.get("training_dates")
+    if last_id is None:
+        await availability_collection.delete_many({})
+    instructors = {training["_id"]: training["instructor"]
+                   async for training in trainings_collection.find({}, {"instructor": 1})}
+
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        batch = await (training_dates_collection.find(query, {"training_id": 1, "start_date": 1, "location": 1,
+                                                              "available_slots": 1})
+                       .sort("_id", 1).limit(batch_size).to_list(length=batch_size))
+        if not batch:
+            return
+
+        updates = []
+        for training_date in batch:
+            updates += rollup_updates(training_date, 1, training_date["available_slots"],
+                                      instructors.get(training_date["training_id"], ""))
+        await availability_collection.bulk_write(updates, ordered=False)
+
+        last_id = batch[-1]["_id"]
+        await state.checkpoint("training_dates", last_id, len(batch))
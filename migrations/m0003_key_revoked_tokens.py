@@ -0,0 +1,47 @@
+"""
+Re-key revoked tokens stored as raw tokens ({token, revoked_at}) by jti or token hash, with an expires_at
+for the TTL index. Entries of tokens that have already expired are dropped.
+"""
+import datetime
+
+from bson import ObjectId
+from jose import jwt, JWTError
+from pymongo import DeleteOne, UpdateOne
+
+from services.token_service import revocation_key
+from utils.database import tokens_collection
+
+VERSION = "0003"
+NAME = "key_revoked_tokens"
+
+
+async def up(state, batch_size: int):
+    last_id = state.checkpoints.get("revoked_tokens")
+    while True:
+        # Old entries have ObjectId keys, new ones string keys; only the old ones match
+        query = {"_id": {"$gt": last_id if last_id is not None else ObjectId("0" * 24)}, "token": {"$exists": True}}
+        batch = await tokens_collection.find(query).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            return
+
+        now = datetime.datetime.now(datetime.UTC)
+        requests = []
+        for document in batch:
+            requests.append(DeleteOne({"_id": document["_id"]}))
+            try:
+                claims = jwt.get_unverified_claims(document["token"])
+            except JWTError:
+                continue
+            if not isinstance(claims.get("exp"), (int, float)):
+                continue
+            expires_at = datetime.datetime.fromtimestamp(claims["exp"], datetime.UTC)
+            if expires_at > now:
+                requests.append(UpdateOne(
+                    {"_id": revocation_key(document["token"], claims)},
+                    {"$setOnInsert": {"expires_at": expires_at, "revoked_at": document.get("revoked_at", now)}},
+                    upsert=True,
+                ))
+        await tokens_collection.bulk_write(requests, ordered=False)
+
+        last_id = batch[-1]["_id"]
+        await state.checkpoint("revoked_tokens", last_id, len(batch))
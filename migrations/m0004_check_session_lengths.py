@@ -0,0 +1,26 @@
+"""
+Check that no training date lasts longer than MAX_SESSION_DAYS. /trainings/time-period only scans the start
+dates from MAX_SESSION_DAYS before the period, so a longer date would silently drop out of its results.
+Only new dates are validated against the bound, which is why existing ones are checked here. Fails with the
+ids of the offending dates: shorten or split them, or raise MAX_SESSION_DAYS, then run the migrations again.
+"""
+from services.schedule_service import MAX_SESSION_LENGTH
+from utils.config import settings
+from utils.database import training_dates_collection
+
+VERSION = "0004"
+NAME = "check_session_lengths"
+
+# Offending dates listed in the error
+REPORTED = 20
+
+
+async def up(state, batch_size: int):
+    too_long = {"$expr": {"$gt": [{"$subtract": ["$end_date", "$start_date"]},
+                                  MAX_SESSION_LENGTH.total_seconds() * 1000]}}
+    count = await training_dates_collection.count_documents(too_long)
+    if count:
+        ids = [str(document["_id"]) async for document in
+               training_dates_collection.find(too_long, {"_id": 1}).limit(REPORTED)]
+        raise RuntimeError(f"{count} training date(s) last longer than MAX_SESSION_DAYS={settings.MAX_SESSION_DAYS} "
+                           f"and would be missing from /trainings/time-period, e.g. {', '.join(ids)}")
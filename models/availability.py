@@ -0,0 +1,15 @@
+from pydantic import BaseModel, ConfigDict
+
+from models.object_id import PyObjectId
+
+
+class AvailabilityResponse(BaseModel):
+    granularity: str  # day, month
+    period: str  # YYYY-MM-DD or YYYY-MM
+    training_id: PyObjectId
+    location: str
+    instructor: str = ""
+    sessions: int
+    free_slots: int
+
+    model_config = ConfigDict(extra="forbid")
@@ -1,11 +1,13 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
+
+from models.object_id import PyObjectId
 
 
 class BookingBase(BaseModel):
-    training_date_id: str
+    training_date_id: PyObjectId
     customer_name: str
     customer_email: str
     customer_phone: Optional[str] = None
@@ -35,6 +37,20 @@ class BookingResponse(BookingDB):
     id: str
 
 
+class Attendee(BaseModel):
+    customer_name: str
+    customer_email: str
+    customer_phone: Optional[str] = None
+    notes: Optional[str] = None
+
+
+class BookingBatchCreate(BaseModel):
+    training_date_id: PyObjectId
+    attendees: List[Attendee] = Field(min_length=1)
+    # all_or_nothing books everyone or no one, best_effort books as many attendees as there are slots, in order
+    mode: Literal["all_or_nothing", "best_effort"] = "all_or_nothing"
+
+
 class BookingUpdate(BookingBase):
     id: str
     status: Optional[str] = None
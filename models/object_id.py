@@ -0,0 +1,21 @@
+from typing import Annotated, Any
+
+from bson import ObjectId
+from pydantic import PlainSerializer, PlainValidator, WithJsonSchema
+
+
+def validate_object_id(value: Any) -> ObjectId:
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    raise ValueError("Invalid id")
+
+
+# Reference to another document: stored as a native ObjectId, exchanged with clients as a string
+PyObjectId = Annotated[
+    ObjectId,
+    PlainValidator(validate_object_id),
+    PlainSerializer(str, return_type=str, when_used="json"),
+    WithJsonSchema({"type": "string", "example": "60d21b4667d0d8992e610c85"}),
+]
@@ -0,0 +1,21 @@
+from typing import Optional
+
+from pydantic import BaseModel, create_model
+
+
+def partial_model(model: type[BaseModel], name: str) -> type[BaseModel]:
+    """
+    Copy of a response model for sparse fieldsets: `id` stays required, every other field becomes optional
+    because the client may not have asked for it. Fields excluded from the output (password) are left out.
+    """
+    fields = {}
+    for field_name, field in model.model_fields.items():
+        if field.exclude:
+            continue
+        # Keeps the validators and JSON schema attached to the type, e.g. of PyObjectId
+        annotation = field.rebuild_annotation()
+        if field_name == "id":
+            fields[field_name] = (annotation, ...)
+        else:
+            fields[field_name] = (Optional[annotation], None)
+    return create_model(name, **fields)
@@ -2,30 +2,59 @@ from typing import List, Optional
 
 from pydantic import BaseModel
 
+from models.availability import AvailabilityResponse
 from models.booking import BookingResponse
+from models.partial import partial_model
 from models.training import TrainingResponse
 from models.training_date import TrainingDateResponse
 from models.user import UserResponse
 
+# Rows of the list endpoints, which return only the fields asked for with ?fields=
+PartialUserResponse = partial_model(UserResponse, "PartialUserResponse")
+PartialTrainingResponse = partial_model(TrainingResponse, "PartialTrainingResponse")
+PartialTrainingDateResponse = partial_model(TrainingDateResponse, "PartialTrainingDateResponse")
+PartialBookingResponse = partial_model(BookingResponse, "PartialBookingResponse")
+
 
 class UserListResponse(BaseModel):
     status: bool
-    data: List[UserResponse]
+    data: List[PartialUserResponse]
+    next_cursor: Optional[str] = None
 
 
 class TrainingListResponse(BaseModel):
     status: bool
-    data: List[TrainingResponse]
+    data: List[PartialTrainingResponse]
+    next_cursor: Optional[str] = None
 
 
 class TrainingDateListResponse(BaseModel):
     status: bool
-    data: List[TrainingDateResponse]
+    data: List[PartialTrainingDateResponse]
+    next_cursor: Optional[str] = None
 
 
 class BookingListResponse(BaseModel):
     status: bool
-    data: List[BookingResponse]
+    data: List[PartialBookingResponse]
+    next_cursor: Optional[str] = None
+
+
+class AvailabilityListResponse(BaseModel):
+    status: bool
+    data: List[AvailabilityResponse]
+
+
+class BulkItemResult(BaseModel):
+    index: int
+    id: Optional[str] = None
+    detail: Optional[str] = None  # why the item failed, if it did
+
+
+class BulkResponse(BaseModel):
+    status: bool
+    message: str
+    results: List[BulkItemResult]
 
 
 class SuccessResponse(BaseModel):
@@ -8,6 +8,7 @@ from pydantic import BaseModel, Field, ConfigDict
 class RoleBase(BaseModel):
     name: str
     permissions: List[str]
+    version: int = 1  # bump on every change so polling workers pick it up
 
 
 class RoleDB(RoleBase):
@@ -1,10 +1,13 @@
-from datetime import datetime
+from datetime import date, datetime
+from typing import List, Literal, Optional
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+
+from models.object_id import PyObjectId
 
 
 class TrainingDateBase(BaseModel):
-    training_id: str
+    training_id: PyObjectId
     start_date: datetime
     end_date: datetime
     location: str
@@ -36,3 +39,38 @@ class TrainingDateResponse(TrainingDateDB):
 class TrainingDateUpdate(TrainingDateBase):
     id: str
     created_by: str
+
+
+class TrainingDateSession(BaseModel):
+    start_date: datetime
+    end_date: datetime
+    location: Optional[str] = None  # defaults to the location of the batch
+    available_slots: Optional[int] = Field(default=None, ge=0)  # defaults to the slots of the batch
+
+
+class TrainingDateRecurrence(BaseModel):
+    frequency: Literal["daily", "weekly"]
+    interval: int = Field(default=1, ge=1, le=365)  # every n days or weeks
+    first_start: datetime
+    duration_hours: float = Field(gt=0)
+    weekdays: List[int] = []  # 0 = Monday; weekly only, defaults to the weekday of first_start
+    until: Optional[date] = None  # last day that may hold a session
+    count: Optional[int] = Field(default=None, ge=1)  # number of sessions to create
+    exceptions: List[date] = []  # days to skip, e.g. public holidays
+
+    @model_validator(mode="after")
+    def check_end(self):
+        if self.until is None and self.count is None:
+            raise ValueError("Either until or count is required")
+        if any(day < 0 or day > 6 for day in self.weekdays):
+            raise ValueError("Weekdays must be between 0 (Monday) and 6 (Sunday)")
+        return self
+
+
+class TrainingDateBulkCreate(BaseModel):
+    training_id: PyObjectId
+    location: str
+    available_slots: int = Field(default=10, ge=0)
+    dates: List[TrainingDateSession] = []
+    recurrence: Optional[TrainingDateRecurrence] = None
+    ordered: bool = False  # stop at the first failing session instead of inserting all valid ones
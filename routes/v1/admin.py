@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends
+
+from services.email_service import email_worker
+from services.password_service import password_hasher
+from services.slot_feed import slot_feed
+from services.token_service import revocation_list
+from utils.database import get_index_stats
+from utils.helper import user_cache
+from utils.permissions import require_role, role_table
+from utils.response_cache import catalog_cache
+from utils.token_decoder import access_tokens
+
+router = APIRouter(prefix="/admin", tags=["Administration"], dependencies=[Depends(require_role("admin"))])
+
+
+@router.get("/indexes")
+async def get_indexes():
+    """
+    Get definition, size and usage statistics of all database indexes.
+    """
+    return {"status": True, "data": await get_index_stats()}
+
+
+@router.get("/cache")
+async def get_cache_stats():
+    """
+    Get size and hit/miss counters of the in-process caches.
+    """
+    return {"status": True, "data": {"users": user_cache.stats(), "roles": role_table.stats(),
+                                     "catalog": catalog_cache.stats(), "revoked_tokens": revocation_list.stats(),
+                                     "access_tokens": access_tokens.stats()}}
+
+
+@router.post("/roles/reload")
+async def reload_roles():
+    """
+    Reload the in-memory role table from the database.
+    """
+    await role_table.load()
+    return {"status": True, "data": role_table.stats()}
+
+
+@router.get("/password-hashing")
+async def get_password_hashing_stats():
+    """
+    Get queue depth and counters of the password hashing pool.
+    """
+    return {"status": True, "data": password_hasher.stats()}
+
+
+@router.get("/email")
+async def get_email_stats():
+    """
+    Get delivery counters of the email outbox worker and the number of mails per outbox status.
+    """
+    return {"status": True, "data": await email_worker.stats()}
+
+
+@router.get("/streams")
+async def get_stream_stats():
+    """
+    Get the source of the training date event streams and their subscriber and eviction counters.
+    """
+    return {"status": True, "data": slot_feed.stats()}
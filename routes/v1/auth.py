@@ -1,23 +1,29 @@
 import datetime
+import uuid
 from datetime import timedelta
 
 from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.security import APIKeyHeader, OAuth2PasswordRequestForm
-from jose import jwt, JWTError
-from passlib.context import CryptContext
+from jose import jwt
+from pymongo.errors import DuplicateKeyError
 
 from limiter import limiter
-from models.response import UserListResponse
+from models.response import PartialUserResponse, UserListResponse
 from models.token import Token
 from models.user import UserDB, UserBase
+from services.password_service import hash_password, verify_password
+from services.token_service import check_refresh_token, revoke_refresh_token
 from utils.config import settings
-from utils.database import users_collection, tokens_collection
-from utils.helper import convert_objectid_to_str, get_current_user
+from utils.database import users_collection
+from utils.fields import sparse_fields
+from utils.helper import get_current_user, invalidate_user
+from utils.pagination import fetch_page
+from utils.serialization import FastJSONResponse
+from utils.streaming import stream_page, wants_stream
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
 
@@ -26,21 +32,36 @@ api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 async def register(user: UserBase, request: Request):
     if await users_collection.find_one({"email": user.email}):
         raise HTTPException(status_code=400, detail="Email already registered")
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password(user.password)
     user_data = {"email": user.email, "password": hashed_password, "roles": user.roles, "permissions": user.permissions,
                  "created_at": datetime.datetime.now(datetime.UTC)}
     user = UserDB.model_validate(user_data)
-    id = await users_collection.insert_one(user.model_dump())
+    try:
+        id = await users_collection.insert_one(user.model_dump())
+    except DuplicateKeyError:
+        # Registered concurrently since the check above
+        raise HTTPException(status_code=400, detail="Email already registered")
     return {"id": str(id.inserted_id)}
 
 
 @router.get("/users", response_model=UserListResponse)
-async def get_users():
-    users = await users_collection.find({}, {"__v": 0}).to_list()
-    for user in users:
-        user["id"] = convert_objectid_to_str(user["_id"])
-        del user["_id"]
-    return {"status": True, "data": users}
+async def get_users(
+        request: Request,
+        limit: int = Query(settings.DEFAULT_GET_LIMIT, ge=1, le=settings.MAX_GET_LIMIT,
+                           description="Limit the number of results"),
+        cursor: str = Query(None, description="Cursor of the next page, taken from next_cursor"),
+        stream: bool = Query(False, description="Stream the results as they are read; also enabled by "
+                                                "Accept: application/x-ndjson"),
+        fields: dict = Depends(sparse_fields(PartialUserResponse)),
+):
+    # Rows skip the response model, so the password hashes must not be read at all;
+    # PartialUserResponse has no password field, so ?fields= cannot ask for it either
+    projection = fields or {"__v": 0, "password": 0}
+    if wants_stream(request, stream):
+        return stream_page(request, users_collection, {}, cursor, limit, projection=projection)
+
+    users, next_cursor = await fetch_page(users_collection, {}, cursor, limit, projection=projection)
+    return FastJSONResponse({"status": True, "data": users, "next_cursor": next_cursor})
 
 
 @router.post("/login", response_model=Token)
@@ -72,7 +93,7 @@ async def login(request: Request):
 @limiter.limit("1/second")
 async def logout(refresh_token: str, request: Request, user=Depends(get_current_user)):
     if user:
-        await revoke_token(refresh_token)
+        await revoke_refresh_token(refresh_token)
         return {"message": "Logged out"}
     else:
         raise HTTPException(status_code=401, detail="Invalid Session")
@@ -81,40 +102,28 @@ async def logout(refresh_token: str, request: Request, user=Depends(get_current_
 @router.post("/refresh-token")
 @limiter.limit("5/minute")
 async def refresh_token_auth(given_refresh_token: str, request: Request):
-    try:
-        payload = jwt.decode(given_refresh_token, settings.REFRESH_SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id = payload.get("sub")
-        # Check if the refresh token is revoked
-        if await tokens_collection.find_one({"token": given_refresh_token}):
-            raise HTTPException(status_code=401, detail="Refresh token revoked")
-        user = await users_collection.find_one({"_id": ObjectId(user_id)})
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        new_access_token = create_access_token({"sub": user_id})
-        return {"access_token": new_access_token, "token_type": "bearer"}
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    # Raises if the token is invalid or revoked
+    payload = await check_refresh_token(given_refresh_token)
+    user_id = payload.get("sub")
+    user = await users_collection.find_one({"_id": ObjectId(user_id)}, {"_id": 1})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    new_access_token = create_access_token({"sub": user_id})
+    return {"access_token": new_access_token, "token_type": "bearer"}
 
 
 @router.post("/change-password")
 async def change_password(user=Depends(get_current_user)):
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password(user.password)
     result = await users_collection.users.update_one({"email": user.email}, {"$set": {"password": hashed_password}})
 
     if result.modified_count == 0:
         raise HTTPException(status_code=500, detail="Failed to update password")
+    invalidate_user(user.id)
 
     return {"status": True, "message": "Password updated successfully"}
 
 
-def hash_password(password: str):
-    return pwd_context.hash(password)
-
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.datetime.now(datetime.UTC) + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -125,19 +134,14 @@ def create_access_token(data: dict):
 def create_refresh_token(data: dict):
     to_encode = data.copy()
     expire = datetime.datetime.now(datetime.UTC) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    to_encode.update({"exp": expire})
+    # The jti identifies the token when it is revoked, so the token itself never has to be stored
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     return jwt.encode(to_encode, settings.REFRESH_SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
 async def authenticate_user(email: str, password: str):
     user = await users_collection.find_one({"email": email})
-    if user and verify_password(password, user["password"]):
-        user = convert_objectid_to_str(user)  # Convert ObjectId to string
-        user['id'] = user['_id']
-        del user['_id']
+    if user and await verify_password(password, user["password"]):
+        user["id"] = str(user.pop("_id"))
         return UserDB(**user)
     return None
-
-
-async def revoke_token(token: str):
-    await tokens_collection.insert_one({"token": token, "revoked_at": datetime.datetime.now(datetime.UTC)})
@@ -0,0 +1,51 @@
+import datetime
+from typing import Literal
+
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from models.response import AvailabilityListResponse
+from services.availability_service import period_key
+from utils.config import settings
+from utils.database import catalog_availability_collection
+from utils.helper import parse_object_id
+from utils.response_cache import catalog_cache
+from utils.serialization import FastJSONResponse
+
+router = APIRouter(prefix="/availability", tags=["Availability"])
+
+
+@router.get("/", response_model=AvailabilityListResponse)
+@catalog_cache.cached("trainings", "training_dates")
+async def get_availability(
+        request: Request,
+        start_date: datetime.date = Query(..., description="First day of the calendar"),
+        end_date: datetime.date = Query(..., description="Last day of the calendar"),
+        granularity: Literal["day", "month"] = Query("day", description="Count per day or per month"),
+        training_id: str = Query(None, description="Filter by training id"),
+        location: str = Query(None, description="Filter by location"),
+        instructor: str = Query(None, description="Filter by instructor"),
+        limit: int = Query(settings.DEFAULT_GET_LIMIT, ge=1, le=settings.MAX_GET_LIMIT,
+                           description="Limit the number of results")
+):
+    """
+    Get the number of sessions and free slots per training and location for each day or month of a period.
+    """
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="Start date must not be after end date")
+
+    query = {
+        "granularity": granularity,
+        "period": {"$gte": period_key(granularity, start_date), "$lte": period_key(granularity, end_date)},
+        "sessions": {"$gt": 0},
+    }
+    if training_id:
+        query["training_id"] = parse_object_id(training_id, "training id")
+    if location:
+        query["location"] = location
+    if instructor:
+        query["instructor"] = instructor
+
+    rows = await (catalog_availability_collection.find(query, {"_id": 0})
+                  .sort([("period", 1), ("training_id", 1), ("location", 1)])
+                  .to_list(length=limit))
+    return FastJSONResponse({"status": True, "data": rows})
@@ -1,25 +1,46 @@
 import datetime
 
-from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Body, Request
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 
-from models.booking import BookingDB, BookingUpdate, BookingBase
-from models.response import SuccessResponse, BookingListResponse
+from models.booking import BookingBatchCreate, BookingDB, BookingUpdate, BookingBase
+from models.response import BulkResponse, SuccessResponse, BookingListResponse, PartialBookingResponse
+from services.email_service import enqueue_email, enqueue_emails
+from services.reservation_service import reserve_available_slots, reserve_slots, release_slots
 from utils.config import settings
-from utils.database import bookings_collection, training_dates_collection
-from utils.helper import get_current_user, convert_objectid_to_str
+from utils.database import bookings_collection
+from utils.fields import sparse_fields
+from utils.helper import get_current_user, parse_object_id
+from utils.pagination import fetch_page
+from utils.serialization import FastJSONResponse
+from utils.streaming import stream_page, wants_stream
 from utils.permissions import check_permission
 
 router = APIRouter(prefix="/bookings", tags=["Bookings"])
 
 
+def booking_mail(booking: dict, action: str, training_date: dict = None) -> tuple[str, str, str]:
+    """(to, subject, body) of the mail telling the customer that their booking was `action`."""
+    when = ""
+    if training_date:
+        when = f" on {training_date['start_date']:%Y-%m-%d %H:%M} in {training_date['location']}"
+    message = (f"Hello {booking['customer_name']},\n\n"
+               f"your booking for training date {booking['training_date_id']}{when} was {action}.\n")
+    return booking["customer_email"], f"Your booking was {action}", message
+
+
 @router.get("/", response_model=BookingListResponse, dependencies=[Depends(check_permission("manage_booking"))])
 async def get_bookings(
+        request: Request,
         id: str = Query(None, description="Filter by id"),
         training_date_id: str = Query(None, description="Filter by training date id"),
         customer_email: str = Query(None, description="Filter by customer email"),
         limit: int = Query(settings.DEFAULT_GET_LIMIT, ge=1, le=settings.MAX_GET_LIMIT,
                            description="Limit the number of results"),
+        cursor: str = Query(None, description="Cursor of the next page, taken from next_cursor"),
+        stream: bool = Query(False, description="Stream the results as they are read; also enabled by "
+                                                "Accept: application/x-ndjson"),
+        projection: dict = Depends(sparse_fields(PartialBookingResponse)),
         user=Depends(get_current_user)
 ):
     """
@@ -28,9 +49,9 @@ async def get_bookings(
     """
     query = {}
     if id:
-        query["_id"] = ObjectId(id)
+        query["_id"] = parse_object_id(id)
     if training_date_id:
-        query["training_date_id"] = training_date_id
+        query["training_date_id"] = parse_object_id(training_date_id, "training date id")
     if customer_email:
         query["customer_email"] = customer_email
 
@@ -38,60 +59,144 @@ async def get_bookings(
     if "admin" not in user.roles:
         query["customer_email"] = user.email
 
-    bookings = await bookings_collection.find(query).to_list(length=limit)
-    for booking in bookings:
-        booking["id"] = convert_objectid_to_str(booking["_id"])
-        del booking["_id"]
+    if wants_stream(request, stream):
+        return stream_page(request, bookings_collection, query, cursor, limit, projection=projection)
 
-
-    return {"status": True, "data": bookings}
+    bookings, next_cursor = await fetch_page(bookings_collection, query, cursor, limit, projection=projection)
+    return FastJSONResponse({"status": True, "data": bookings, "next_cursor": next_cursor})
 
 
 @router.post("/", response_model=SuccessResponse, dependencies=[Depends(check_permission("manage_booking"))])
-async def create_booking(booking: BookingBase, user=Depends(get_current_user)):
+async def create_booking(booking: BookingBase, background_tasks: BackgroundTasks, user=Depends(get_current_user)):
     """
     Create a new booking. This endpoint requires authentication and the 'manage_booking' permission.
     """
-    # Check if the training date exists
-    training_date = await training_dates_collection.find_one({"_id": ObjectId(booking.training_date_id)})
-    if not training_date:
-        raise HTTPException(status_code=404, detail="Training date not found")
-
-    # Check if there are available slots
-    if training_date["available_slots"] <= 0:
-        raise HTTPException(status_code=400, detail="No available slots for this training date")
-
-    # Check if the customer already has a booking for this training date
-    existing = await bookings_collection.find_one({
-        "training_date_id": booking.training_date_id,
-        "customer_email": booking.customer_email
-    })
-    if existing:
-        raise HTTPException(status_code=400, detail="You already have a booking for this training date")
+    # Take the slot first; this fails if the date does not exist or is sold out
+    training_date = await reserve_slots(booking.training_date_id)
 
     booking_dict = booking.model_dump()
     booking_dict["created_at"] = datetime.datetime.now(datetime.UTC)
     booking_dict["created_by"] = user.id
 
     booking_db = BookingDB(**booking_dict)
-    result = await bookings_collection.insert_one(booking_db.model_dump(exclude_none=True))
-
-    # Update available slots in training date
-    await training_dates_collection.update_one(
-        {"_id": ObjectId(booking.training_date_id)},
-        {"$inc": {"available_slots": -1}}
-    )
+    try:
+        result = await bookings_collection.insert_one(booking_db.model_dump(exclude_none=True))
+    except DuplicateKeyError:
+        await release_slots(booking.training_date_id)
+        raise HTTPException(status_code=400, detail="You already have a booking for this training date")
+    except Exception:
+        await release_slots(booking.training_date_id)
+        raise
 
+    # Queued after the response is sent
+    background_tasks.add_task(enqueue_email, *booking_mail(booking_dict, "confirmed", training_date))
     return {"status": True, "message": "Booking created successfully", "id": str(result.inserted_id)}
 
 
+@router.post("/batch", response_model=BulkResponse, dependencies=[Depends(check_permission("manage_booking"))])
+async def create_bookings_batch(batch: BookingBatchCreate, background_tasks: BackgroundTasks,
+                                user=Depends(get_current_user)):
+    """
+    Book several attendees on one training date at once. Results are reported per attendee index.
+    """
+    if len(batch.attendees) > settings.MAX_BATCH_BOOKINGS:
+        raise HTTPException(status_code=400,
+                            detail=f"A batch cannot contain more than {settings.MAX_BATCH_BOOKINGS} attendees")
+    all_or_nothing = batch.mode == "all_or_nothing"
+
+    results = {}
+    candidates = []
+    seen = set()
+    for index, attendee in enumerate(batch.attendees):
+        if attendee.customer_email in seen:
+            results[index] = {"index": index, "detail": "Attendee appears more than once in this batch"}
+        else:
+            seen.add(attendee.customer_email)
+            candidates.append(index)
+    if all_or_nothing and results:
+        raise HTTPException(status_code=400, detail="Attendees must be unique within a batch")
+
+    # Don't spend slots on attendees who are already booked; the unique index still catches races
+    booked = set(await bookings_collection.distinct("customer_email", {
+        "training_date_id": batch.training_date_id, "customer_email": {"$in": list(seen)},
+    }))
+    if booked:
+        if all_or_nothing:
+            raise HTTPException(status_code=400,
+                                detail=f"Already booked for this training date: {', '.join(sorted(booked))}")
+        for index in [index for index in candidates if batch.attendees[index].customer_email in booked]:
+            results[index] = {"index": index, "detail": "You already have a booking for this training date"}
+        candidates = [index for index in candidates if index not in results]
+
+    # One atomic decrement for the whole group
+    if all_or_nothing:
+        training_date = await reserve_slots(batch.training_date_id, len(candidates))
+        reserved = len(candidates)
+    else:
+        reserved, training_date = await reserve_available_slots(batch.training_date_id, len(candidates))
+    for index in candidates[reserved:]:
+        results[index] = {"index": index, "detail": "No available slots for this training date"}
+    candidates = candidates[:reserved]
+
+    now = datetime.datetime.now(datetime.UTC)
+    documents = [
+        BookingDB(training_date_id=batch.training_date_id, **batch.attendees[index].model_dump(),
+                  created_at=now, created_by=user.id).model_dump(exclude_none=True)
+        for index in candidates
+    ]
+    failed = {}
+    if documents:
+        try:
+            await bookings_collection.insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            failed = {
+                error["index"]: ("You already have a booking for this training date" if error["code"] == 11000
+                                 else error["errmsg"])
+                for error in e.details["writeErrors"]
+            }
+        except Exception:
+            await release_slots(batch.training_date_id, reserved)
+            raise
+
+    inserted = [document["_id"] for position, document in enumerate(documents) if position not in failed]
+    rolled_back = all_or_nothing and bool(failed)
+    if rolled_back:
+        # Undo the part of the group that did get in
+        if inserted:
+            await bookings_collection.delete_many({"_id": {"$in": inserted}})
+        inserted = []
+    if reserved - len(inserted):
+        await release_slots(batch.training_date_id, reserved - len(inserted))
+
+    for position, index in enumerate(candidates):
+        if position in failed:
+            results[index] = {"index": index, "detail": failed[position]}
+        elif rolled_back:
+            results[index] = {"index": index, "detail": "Not booked, another attendee in the batch failed"}
+        else:
+            results[index] = {"index": index, "id": str(documents[position]["_id"])}
+
+    if inserted:
+        booked = set(inserted)
+        background_tasks.add_task(enqueue_emails, [booking_mail(document, "confirmed", training_date)
+                                                   for document in documents if document["_id"] in booked])
+    return {
+        "status": len(inserted) == len(batch.attendees),
+        "message": f"Booked {len(inserted)} of {len(batch.attendees)} attendees",
+        "results": [results[index] for index in range(len(batch.attendees))],
+    }
+
+
 @router.put("/", response_model=SuccessResponse, dependencies=[Depends(check_permission("manage_booking"))])
-async def update_booking(booking_data: BookingUpdate = Body(...), user=Depends(get_current_user)):
+async def update_booking(background_tasks: BackgroundTasks, booking_data: BookingUpdate = Body(...),
+                         user=Depends(get_current_user)):
     """
     Update an existing booking. Admin users can update any booking, regular users can only update their own bookings.
     """
+    booking_id = parse_object_id(booking_data.id)
+
     # Check if the booking exists
-    existing = await bookings_collection.find_one({"_id": ObjectId(booking_data.id)})
+    existing = await bookings_collection.find_one({"_id": booking_id})
     if not existing:
         raise HTTPException(status_code=404, detail="Booking not found")
 
@@ -99,70 +204,63 @@ async def update_booking(booking_data: BookingUpdate = Body(...), user=Depends(g
     if "admin" not in user.roles and existing["customer_email"] != user.email:
         raise HTTPException(status_code=403, detail="Not allowed to update this booking")
 
-    # If changing training_date_id, check if the new training date exists and has available slots
-    if booking_data.training_date_id and booking_data.training_date_id != existing["training_date_id"]:
-        new_training_date = await training_dates_collection.find_one({"_id": ObjectId(booking_data.training_date_id)})
-        if not new_training_date:
-            raise HTTPException(status_code=404, detail="Training date not found")
-
-        if new_training_date["available_slots"] <= 0:
-            raise HTTPException(status_code=400, detail="No available slots for this training date")
-
-        # Check if the customer already has a booking for the new training date
-        duplicate = await bookings_collection.find_one({
-            "training_date_id": booking_data.training_date_id,
-            "customer_email": booking_data.customer_email or existing["customer_email"],
-            "_id": {"$ne": ObjectId(booking_data.id)}
-        })
-        if duplicate:
-            raise HTTPException(status_code=400, detail="You already have a booking for this training date")
-
-        # Update available slots in both old and new training dates
-        await training_dates_collection.update_one(
-            {"_id": ObjectId(existing["training_date_id"])},
-            {"$inc": {"available_slots": 1}}
-        )
-        await training_dates_collection.update_one(
-            {"_id": ObjectId(booking_data.training_date_id)},
-            {"$inc": {"available_slots": -1}}
-        )
+    # If changing training_date_id, take a slot on the new training date before moving
+    old_training_date_id = existing["training_date_id"]
+    moving = booking_data.training_date_id and booking_data.training_date_id != old_training_date_id
+    if moving:
+        await reserve_slots(booking_data.training_date_id)
 
     update_data = booking_data.model_dump(exclude={"id"}, exclude_none=True)
 
-    result = await bookings_collection.update_one(
-        {"_id": ObjectId(booking_data.id)},
-        {"$set": update_data}
-    )
+    try:
+        # Matching on the old date makes a concurrent move of the same booking fail instead of double counting
+        result = await bookings_collection.update_one(
+            {"_id": booking_id, "training_date_id": old_training_date_id},
+            {"$set": update_data}
+        )
+    except DuplicateKeyError:
+        if moving:
+            await release_slots(booking_data.training_date_id)
+        raise HTTPException(status_code=400, detail="You already have a booking for this training date")
+    except Exception:
+        if moving:
+            await release_slots(booking_data.training_date_id)
+        raise
+
+    if result.matched_count == 0:
+        if moving:
+            await release_slots(booking_data.training_date_id)
+        raise HTTPException(status_code=409, detail="Booking was changed concurrently, please retry")
+
+    if moving:
+        await release_slots(old_training_date_id)
 
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Booking not found or no change detected")
 
+    background_tasks.add_task(enqueue_email, *booking_mail({**existing, **update_data}, "updated"))
     return {"status": True, "message": "Booking updated successfully", "id": booking_data.id}
 
 
 @router.delete("/{id}", response_model=SuccessResponse, dependencies=[Depends(check_permission("manage_booking"))])
-async def delete_booking(id: str, user=Depends(get_current_user)):
+async def delete_booking(id: str, background_tasks: BackgroundTasks, user=Depends(get_current_user)):
     """
     Delete a booking. Admin users can delete any booking, regular users can only delete their own bookings.
     """
-    # Check if the booking exists
-    existing = await bookings_collection.find_one({"_id": ObjectId(id)})
-    if not existing:
-        raise HTTPException(status_code=404, detail="Booking not found")
-
+    booking_id = parse_object_id(id)
+    query = {"_id": booking_id}
     # Regular users can only delete their own bookings
-    if "admin" not in user.roles and existing["customer_email"] != user.email:
-        raise HTTPException(status_code=403, detail="Not allowed to delete this booking")
-
-    result = await bookings_collection.delete_one({"_id": ObjectId(id)})
+    if "admin" not in user.roles:
+        query["customer_email"] = user.email
 
-    if result.deleted_count == 0:
+    existing = await bookings_collection.find_one_and_delete(query)
+    if not existing:
+        if await bookings_collection.find_one({"_id": booking_id}, {"_id": 1}):
+            raise HTTPException(status_code=403, detail="Not allowed to delete this booking")
         raise HTTPException(status_code=404, detail="Booking not found")
 
-    # Update available slots in training date
-    await training_dates_collection.update_one(
-        {"_id": ObjectId(existing["training_date_id"])},
-        {"$inc": {"available_slots": 1}}
-    )
+    # Give the slot back to the training date
+    await release_slots(existing["training_date_id"])
 
+    background_tasks.add_task(enqueue_email, *booking_mail(existing, "cancelled"))
     return {"status": True, "message": "Booking deleted successfully"}
@@ -1,40 +1,74 @@
 import datetime
 
 from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
-
-from models.response import SuccessResponse, TrainingDateListResponse
-from models.training_date import TrainingDateBase, TrainingDateDB, TrainingDateUpdate
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Request
+from fastapi.responses import StreamingResponse
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from models.response import BulkResponse, PartialTrainingDateResponse, SuccessResponse, TrainingDateListResponse
+from models.training_date import TrainingDateBase, TrainingDateBulkCreate, TrainingDateDB, TrainingDateUpdate
+from services.availability_service import apply_rollup, record_training_date, rollup_updates
+from services.schedule_service import expand_recurrence, session_error
+from services.slot_feed import slot_feed
 from utils.config import settings
-from utils.database import training_dates_collection, trainings_collection, bookings_collection
-from utils.helper import get_current_user, convert_objectid_to_str
+from utils.database import (bookings_collection, catalog_training_dates_collection, training_dates_collection,
+                            trainings_collection)
+from utils.fields import sparse_fields
+from utils.helper import get_current_user, parse_object_id
+from utils.pagination import fetch_page
+from utils.response_cache import catalog_cache
+from utils.serialization import FastJSONResponse
+from utils.streaming import stream_page, wants_stream
 from utils.permissions import check_permission
 
 router = APIRouter(prefix="/training-dates", tags=["Training Dates"], dependencies=[])
 
 
 @router.get("/", response_model=TrainingDateListResponse)
+@catalog_cache.cached("training_dates")
 async def get_training_dates(
+        request: Request,
         id: str = Query(None, description="Filter by id"),
         training_id: str = Query(None, description="Filter by training id"),
         limit: int = Query(settings.DEFAULT_GET_LIMIT, ge=1, le=settings.MAX_GET_LIMIT,
-                           description="Limit the number of results")
+                           description="Limit the number of results"),
+        cursor: str = Query(None, description="Cursor of the next page, taken from next_cursor"),
+        stream: bool = Query(False, description="Stream the results as they are read; also enabled by "
+                                                "Accept: application/x-ndjson"),
+        projection: dict = Depends(sparse_fields(PartialTrainingDateResponse)),
 ):
     """
-    Get a list of all training dates, optionally filtered by training_id.
+    Get a list of all training dates, optionally filtered by training_id, one page at a time by start date.
     """
     query = {}
     if id:
-        query["_id"] = ObjectId(id)
+        query["_id"] = parse_object_id(id)
     if training_id:
-        query["training_id"] = training_id
+        query["training_id"] = parse_object_id(training_id, "training id")
+
+    if wants_stream(request, stream):
+        return stream_page(request, catalog_training_dates_collection, query, cursor, limit,
+                           sort_keys=("start_date", "_id"), projection=projection)
 
-    training_dates = await training_dates_collection.find(query).to_list(length=limit)
-    for date in training_dates:
-        date["id"] = convert_objectid_to_str(date["_id"])
-        del date["_id"]
+    training_dates, next_cursor = await fetch_page(catalog_training_dates_collection, query, cursor, limit,
+                                                   sort_keys=("start_date", "_id"), projection=projection)
+    return FastJSONResponse({"status": True, "data": training_dates, "next_cursor": next_cursor})
 
-    return {"status": True, "data": training_dates}
+
+@router.get("/stream")
+async def stream_training_dates(
+        training_id: str = Query(None, description="Only changes of the dates of this training"),
+):
+    """
+    Server-Sent Events with the available slots of a training date whenever they change.
+    """
+    if training_id and not ObjectId.is_valid(training_id):
+        raise HTTPException(status_code=400, detail="Invalid training id")
+    slot_feed.check_capacity()
+    # X-Accel-Buffering keeps nginx from holding back the events
+    return StreamingResponse(slot_feed.events(training_id), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 
 @router.post("/", response_model=SuccessResponse, dependencies=[Depends(get_current_user), Depends(check_permission("create"))])
@@ -43,17 +77,14 @@ async def create_training_date(training_date: TrainingDateBase, user=Depends(get
     Create a new training date.
     """
     # Check if the training exists
-    try:
-        id = ObjectId(training_date.training_id)
-    except:
-        raise HTTPException(status_code=404, detail="Training id is not valid")
-    training = await trainings_collection.find_one({"_id": id})
+    training = await trainings_collection.find_one({"_id": training_date.training_id})
     if not training:
         raise HTTPException(status_code=404, detail="Training not found")
 
     # Validate dates
-    if training_date.start_date >= training_date.end_date:
-        raise HTTPException(status_code=400, detail="Start date must be before end date")
+    error = session_error(training_date.start_date, training_date.end_date)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
 
     # Check if the available slots is valid
     if training_date.available_slots > training["max_participants"]:
@@ -68,17 +99,99 @@ async def create_training_date(training_date: TrainingDateBase, user=Depends(get
 
     training_date_db = TrainingDateDB(**training_date_dict)
     result = await training_dates_collection.insert_one(training_date_db.model_dump(exclude_none=True))
+    catalog_cache.invalidate("training_dates")
+    await record_training_date(training_date_dict, instructor=training["instructor"])
 
     return {"status": True, "message": "Training date created successfully", "id": str(result.inserted_id)}
 
 
+@router.post("/bulk", response_model=BulkResponse, dependencies=[Depends(get_current_user), Depends(check_permission("create"))])
+async def create_training_dates_bulk(bulk: TrainingDateBulkCreate, user=Depends(get_current_user)):
+    """
+    Create many dates of one training at once, from a list of sessions and/or a recurrence rule.
+    Sessions are reported by their index: the listed dates first, then the generated ones.
+    """
+    training = await trainings_collection.find_one({"_id": bulk.training_id})
+    if not training:
+        raise HTTPException(status_code=404, detail="Training not found")
+
+    cap = settings.MAX_BULK_TRAINING_DATES
+    if len(bulk.dates) > cap:
+        raise HTTPException(status_code=400, detail=f"A batch cannot contain more than {cap} training dates")
+    sessions = [(d.start_date, d.end_date, d.location, d.available_slots) for d in bulk.dates]
+    if bulk.recurrence:
+        generated = expand_recurrence(bulk.recurrence, cap - len(sessions))
+        sessions += [(start, end, None, None) for start, end in generated]
+    if not sessions:
+        raise HTTPException(status_code=400, detail="No training dates to create")
+
+    now = datetime.datetime.now(datetime.UTC)
+    results = {}
+    documents = []
+    for index, (start_date, end_date, location, available_slots) in enumerate(sessions):
+        available_slots = bulk.available_slots if available_slots is None else available_slots
+        error = session_error(start_date, end_date)
+        if error:
+            results[index] = {"index": index, "detail": error}
+        elif available_slots > training["max_participants"]:
+            results[index] = {
+                "index": index,
+                "detail": f"Available slots cannot exceed maximum participants ({training['max_participants']})",
+            }
+        else:
+            training_date_db = TrainingDateDB(training_id=bulk.training_id, start_date=start_date, end_date=end_date,
+                                              location=location or bulk.location, available_slots=available_slots,
+                                              created_by=user.id, created_at=now)
+            documents.append((index, training_date_db.model_dump(exclude_none=True)))
+
+    # An ordered batch stops at the first invalid session, like insert_many stops at the first failing write
+    if bulk.ordered and results:
+        first_invalid = min(results)
+        documents = [(index, document) for index, document in documents if index < first_invalid]
+
+    failed = {}
+    if documents:
+        try:
+            await training_dates_collection.insert_many([document for _, document in documents], ordered=bulk.ordered)
+        except BulkWriteError as e:
+            failed = {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+            if bulk.ordered:
+                # Nothing after the failing write was attempted
+                first_failed = min(failed)
+                failed.update({position: "Not inserted, an earlier training date failed"
+                               for position in range(first_failed + 1, len(documents))})
+
+    inserted = []
+    for position, (index, document) in enumerate(documents):
+        if position in failed:
+            results[index] = {"index": index, "detail": failed[position]}
+        else:
+            results[index] = {"index": index, "id": str(document["_id"])}
+            inserted.append(document)
+    for index in range(len(sessions)):
+        results.setdefault(index, {"index": index, "detail": "Not inserted, an earlier training date failed"})
+
+    if inserted:
+        catalog_cache.invalidate("training_dates")
+        await apply_rollup([update for document in inserted for update in
+                            rollup_updates(document, 1, document["available_slots"], training["instructor"])])
+
+    return {
+        "status": len(inserted) == len(sessions),
+        "message": f"Created {len(inserted)} of {len(sessions)} training dates",
+        "results": [results[index] for index in range(len(sessions))],
+    }
+
+
 @router.put("/", response_model=SuccessResponse, dependencies=[Depends(get_current_user), Depends(check_permission("update"))])
 async def update_training_date(training_date_data: TrainingDateUpdate = Body(...), user=Depends(get_current_user)):
     """
     Update an existing training date.
     """
+    training_date_id = parse_object_id(training_date_data.id)
+
     # Check if the training date exists
-    existing = await training_dates_collection.find_one({"_id": ObjectId(training_date_data.id)})
+    existing = await training_dates_collection.find_one({"_id": training_date_id})
     if not existing:
         raise HTTPException(status_code=404, detail="Training date not found")
 
@@ -88,20 +201,21 @@ async def update_training_date(training_date_data: TrainingDateUpdate = Body(...
 
     # Check if the training exists if training_id is provided
     if training_date_data.training_id:
-        training = await trainings_collection.find_one({"_id": ObjectId(training_date_data.training_id)})
+        training = await trainings_collection.find_one({"_id": training_date_data.training_id})
         if not training:
             raise HTTPException(status_code=404, detail="Training not found")
 
     # Validate dates if both are provided
     if training_date_data.start_date and training_date_data.end_date:
-        if training_date_data.start_date >= training_date_data.end_date:
-            raise HTTPException(status_code=400, detail="Start date must be before end date")
+        error = session_error(training_date_data.start_date, training_date_data.end_date)
+        if error:
+            raise HTTPException(status_code=400, detail=error)
 
     # Check if the available slots is valid
     if training_date_data.available_slots is not None:
         # Get the training to check max_participants
         training_id = training_date_data.training_id or existing["training_id"]
-        training = await trainings_collection.find_one({"_id": ObjectId(training_id)})
+        training = await trainings_collection.find_one({"_id": training_id})
         if training_date_data.available_slots > training["max_participants"]:
             raise HTTPException(
                 status_code=400, 
@@ -109,7 +223,7 @@ async def update_training_date(training_date_data: TrainingDateUpdate = Body(...
             )
 
         # Check if there are already bookings for this date
-        bookings_count = await bookings_collection.count_documents({"training_date_id": training_date_data.id})
+        bookings_count = await bookings_collection.count_documents({"training_date_id": training_date_id})
         if bookings_count > training_date_data.available_slots:
             raise HTTPException(
                 status_code=400, 
@@ -118,13 +232,19 @@ async def update_training_date(training_date_data: TrainingDateUpdate = Body(...
 
     update_data = training_date_data.model_dump(exclude={"id", "created_by"}, exclude_none=True)
 
-    result = await training_dates_collection.update_one(
-        {"_id": ObjectId(training_date_data.id)},
-        {"$set": update_data}
+    # The document as it was right before this write, so the rollup can take out exactly what it counted
+    previous = await training_dates_collection.find_one_and_update(
+        {"_id": training_date_id},
+        {"$set": update_data},
+        return_document=ReturnDocument.BEFORE,
     )
 
-    if result.modified_count == 0:
+    if not previous or all(previous.get(key) == value for key, value in update_data.items()):
         raise HTTPException(status_code=404, detail="Training date not found or no change detected")
+    catalog_cache.invalidate("training_dates")
+    updated = {**previous, **update_data}
+    await apply_rollup(rollup_updates(previous, -1, -previous["available_slots"])
+                       + rollup_updates(updated, 1, updated["available_slots"], training["instructor"]))
 
     return {"status": True, "message": "Training date updated successfully", "id": training_date_data.id}
 
@@ -134,8 +254,10 @@ async def delete_training_date(id: str, user=Depends(get_current_user)):
     """
     Delete a training date.
     """
+    training_date_id = parse_object_id(id)
+
     # Check if the training date exists
-    existing = await training_dates_collection.find_one({"_id": ObjectId(id)})
+    existing = await training_dates_collection.find_one({"_id": training_date_id})
     if not existing:
         raise HTTPException(status_code=404, detail="Training date not found")
 
@@ -144,13 +266,15 @@ async def delete_training_date(id: str, user=Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Not allowed to delete this training date")
 
     # Check if there are any bookings for this training date
-    bookings = await bookings_collection.find_one({"training_date_id": id})
+    bookings = await bookings_collection.find_one({"training_date_id": training_date_id})
     if bookings:
         raise HTTPException(status_code=400, detail="Cannot delete training date with associated bookings")
 
-    result = await training_dates_collection.delete_one({"_id": ObjectId(id)})
+    deleted = await training_dates_collection.find_one_and_delete({"_id": training_date_id})
 
-    if result.deleted_count == 0:
+    if not deleted:
         raise HTTPException(status_code=404, detail="Training date not found")
+    catalog_cache.invalidate("training_dates")
+    await record_training_date(deleted, sign=-1)
 
     return {"status": True, "message": "Training date deleted successfully"}
@@ -1,14 +1,22 @@
 import datetime
 import logging
 
-from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException, Query, Body
+from fastapi import APIRouter, Depends, HTTPException, Query, Body, Request
+from pymongo.errors import DuplicateKeyError
 
-from models.response import SuccessResponse, TrainingListResponse
+from models.response import PartialTrainingResponse, SuccessResponse, TrainingListResponse
 from models.training import TrainingBase, TrainingDB, TrainingUpdate
+from services.availability_service import rename_instructor
+from services.schedule_service import MAX_SESSION_LENGTH
 from utils.config import settings
-from utils.database import trainings_collection, training_dates_collection
-from utils.helper import get_current_user, convert_objectid_to_str
+from utils.database import (catalog_training_dates_collection, catalog_trainings_collection, trainings_collection,
+                            training_dates_collection)
+from utils.fields import sparse_fields
+from utils.helper import get_current_user, parse_object_id
+from utils.pagination import fetch_page
+from utils.response_cache import catalog_cache
+from utils.serialization import FastJSONResponse, with_string_id
+from utils.streaming import stream_page, wants_stream
 from utils.permissions import check_permission
 
 router = APIRouter(prefix="/trainings", tags=["Trainings"], dependencies=[])
@@ -17,113 +25,72 @@ logger = logging.getLogger(__name__)
 
 
 @router.get("/", response_model=TrainingListResponse)
+@catalog_cache.cached("trainings")
 async def get_trainings(
+        request: Request,
         id: str = Query(None, description="Filter by id"),
         limit: int = Query(settings.DEFAULT_GET_LIMIT, ge=1, le=settings.MAX_GET_LIMIT,
-                           description="Limit the number of results")
+                           description="Limit the number of results"),
+        cursor: str = Query(None, description="Cursor of the next page, taken from next_cursor"),
+        stream: bool = Query(False, description="Stream the results as they are read; also enabled by "
+                                                "Accept: application/x-ndjson"),
+        projection: dict = Depends(sparse_fields(PartialTrainingResponse)),
 ):
     """
-    Get a list of all trainings.
+    Get a list of all trainings, one page at a time in creation order.
     """
     query = {}
     if id is not None:
-        query["_id"] = ObjectId(id)
+        query["_id"] = parse_object_id(id)
 
-    trainings = await trainings_collection.find(query).to_list(length=limit)
-    for training in trainings:
-        training["id"] = convert_objectid_to_str(training["_id"])
-        del training["_id"]
+    if wants_stream(request, stream):
+        return stream_page(request, catalog_trainings_collection, query, cursor, limit, projection=projection)
 
-    return {"status": True, "data": trainings}
+    trainings, next_cursor = await fetch_page(catalog_trainings_collection, query, cursor, limit, projection=projection)
+    return FastJSONResponse({"status": True, "data": trainings, "next_cursor": next_cursor})
 
 
 @router.get("/time-period", response_model=TrainingListResponse)
+@catalog_cache.cached("trainings", "training_dates")
 async def get_trainings_by_time_period(
+        request: Request,
         start_date: datetime.datetime = Query(..., description="Start date for filtering"),
         end_date: datetime.datetime = Query(..., description="End date for filtering"),
         limit: int = Query(settings.DEFAULT_GET_LIMIT, ge=1, le=settings.MAX_GET_LIMIT,
-                           description="Limit the number of results")
+                           description="Limit the number of results"),
+        projection: dict = Depends(sparse_fields(PartialTrainingResponse)),
 ):
     """
     Get a list of trainings available in a specific time period.
-    This endpoint queries training dates and returns the associated trainings.
+    A training is available if one of its dates overlaps the period.
     """
-    # First, find training dates in the specified period
-    pipeline = [
-        {
-            "$match": {
-                "start_date": {"$gte": start_date},
-                "end_date": {"$lte": end_date}
-            }
-        },
-        {
-            "$project": {
-                "training_id": 1,
-                "training_id_type": {"$type": "$training_id"},
-                "start_date": 1,
-                "end_date": 1
-            }
-        },
-        {
-            "$addFields": {
-                "training_id": {
-                    "$cond": {
-                        "if": {"$eq": [{"$type": "$training_id"}, "string"]},
-                        "then": {"$toObjectId": "$training_id"},
-                        "else": "$training_id"
-                    }
-                }
-            }
-        },
-        {
-            "$lookup": {
-                "from": "trainings",
-                "localField": "training_id",
-                "foreignField": "_id",
-                "as": "training"
-            }
-        },
-        {
-            "$project": {
-                "training_id": 1,
-                "training": 1,
-                "training_array_size": {"$size": "$training"}
-            }
-        },
-        {
-            "$unwind": {
-                "path": "$training",
-                "preserveNullAndEmptyArrays": True
-            }
-        },
-        {
-            "$replaceRoot": {"newRoot": "$training"}
-        },
-        {
-            "$group": {
-                "_id": "$_id",
-                "name": {"$first": "$name"},
-                "description": {"$first": "$description"},
-                "price": {"$first": "$price"},
-                "instructor": {"$first": "$instructor"},
-                "duration_hours": {"$first": "$duration_hours"},
-                "max_participants": {"$first": "$max_participants"},
-                "created_at": {"$first": "$created_at"},
-                "created_by": {"$first": "$created_by"}
-            }
-        },
-        {
-            "$limit": limit
-        }
-    ]
-
-    trainings = await training_dates_collection.aggregate(pipeline).to_list(length=limit)
-
-    for training in trainings:
-        training["id"] = convert_objectid_to_str(training["_id"])
-        del training["_id"]
-
-    return {"status": True, "data": trainings}
+    trainings = await find_trainings_in_period(start_date, end_date, limit, projection)
+    return FastJSONResponse({"status": True, "data": trainings})
+
+
+async def find_trainings_in_period(start_date: datetime.datetime, end_date: datetime.datetime, limit: int,
+                                   projection: dict = None) -> list:
+    # Distinct ids of the trainings with a date overlapping the period, answered from the
+    # (start_date, end_date, training_id) index without reading the documents. No date lasts longer than
+    # MAX_SESSION_LENGTH, which bounds the start dates to scan on both sides.
+    # The trainings whose first date in the period comes earliest are kept, so the cut is stable.
+    training_ids = await catalog_training_dates_collection.aggregate([
+        {"$match": {"start_date": {"$gte": start_date - MAX_SESSION_LENGTH, "$lte": end_date},
+                    "end_date": {"$gte": start_date}}},
+        {"$sort": {"start_date": 1}},
+        {"$project": {"_id": 0, "start_date": 1, "training_id": 1}},
+        {"$group": {"_id": "$training_id", "first_start": {"$first": "$start_date"}}},
+        {"$sort": {"first_start": 1, "_id": 1}},
+        {"$limit": limit},
+    ]).to_list(length=limit)
+    ids = [row["_id"] for row in training_ids]
+
+    # One batched fetch of the trainings themselves
+    return await catalog_trainings_collection.aggregate([
+        {"$match": {"_id": {"$in": ids}}},
+        {"$sort": {"_id": 1}},
+        *with_string_id(projection),
+    ]).to_list(length=limit)
 
 
 @router.post("/", response_model=SuccessResponse,
@@ -142,7 +109,12 @@ async def create_training(training: TrainingBase, user=Depends(get_current_user)
     training_dict["created_at"] = datetime.datetime.now(datetime.UTC)
 
     training_db = TrainingDB(**training_dict)
-    result = await trainings_collection.insert_one(training_db.model_dump(exclude_none=True))
+    try:
+        result = await trainings_collection.insert_one(training_db.model_dump(exclude_none=True))
+    except DuplicateKeyError:
+        # Created concurrently since the check above
+        raise HTTPException(status_code=400, detail="Training with this name already exists")
+    catalog_cache.invalidate("trainings")
 
     return {"status": True, "message": "Training created successfully", "id": str(result.inserted_id)}
 
@@ -153,8 +125,10 @@ async def update_training(training_data: TrainingUpdate = Body(...), user=Depend
     """
     Update an existing training.
     """
+    training_id = parse_object_id(training_data.id)
+
     # Check if the training exists
-    existing = await trainings_collection.find_one({"_id": ObjectId(training_data.id)})
+    existing = await trainings_collection.find_one({"_id": training_id})
     if not existing:
         raise HTTPException(status_code=404, detail="Training not found")
 
@@ -164,13 +138,19 @@ async def update_training(training_data: TrainingUpdate = Body(...), user=Depend
 
     update_data = training_data.model_dump(exclude={"id", "created_by"}, exclude_none=True)
 
-    result = await trainings_collection.update_one(
-        {"_id": ObjectId(training_data.id)},
-        {"$set": update_data}
-    )
+    try:
+        result = await trainings_collection.update_one(
+            {"_id": training_id},
+            {"$set": update_data}
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Training with this name already exists")
 
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Training not found or no change detected")
+    catalog_cache.invalidate("trainings")
+    if existing["instructor"] != training_data.instructor:
+        await rename_instructor(existing["_id"], training_data.instructor)
 
     return {"status": True, "message": "Training updated successfully", "id": training_data.id}
 
@@ -181,8 +161,10 @@ async def delete_training(id: str, user=Depends(get_current_user)):
     """
     Delete a training.
     """
+    training_id = parse_object_id(id)
+
     # Check if the training exists
-    existing = await trainings_collection.find_one({"_id": ObjectId(id)})
+    existing = await trainings_collection.find_one({"_id": training_id})
     if not existing:
         raise HTTPException(status_code=404, detail="Training not found")
 
@@ -191,13 +173,14 @@ async def delete_training(id: str, user=Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Not allowed to delete this training")
 
     # Check if there are any training dates associated with this training
-    training_dates = await training_dates_collection.find_one({"training_id": id})
+    training_dates = await training_dates_collection.find_one({"training_id": training_id})
     if training_dates:
         raise HTTPException(status_code=400, detail="Cannot delete training with associated dates")
 
-    result = await trainings_collection.delete_one({"_id": ObjectId(id)})
+    result = await trainings_collection.delete_one({"_id": training_id})
 
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Training not found")
+    catalog_cache.invalidate("trainings")
 
     return {"status": True, "message": "Training deleted successfully"}
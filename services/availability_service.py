@@ -0,0 +1,59 @@
+import logging
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from utils.database import availability_collection
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = {"day": "%Y-%m-%d", "month": "%Y-%m"}
+
+
+def period_key(granularity: str, value) -> str:
+    return value.strftime(GRANULARITIES[granularity])
+
+
+def rollup_updates(training_date: dict, sessions: int = 0, free_slots: int = 0, instructor: str = None) -> list:
+    """
+    Upserts adding `sessions` and `free_slots` to the day and month rows of a training date.
+    Sessions are counted on the day they start.
+    """
+    update = {"$inc": {"sessions": sessions, "free_slots": free_slots}}
+    if instructor is not None:
+        update["$set"] = {"instructor": instructor}
+    return [
+        UpdateOne({
+            "granularity": granularity,
+            "period": period_key(granularity, training_date["start_date"]),
+            "training_id": training_date["training_id"],
+            "location": training_date["location"],
+        }, update, upsert=True)
+        for granularity in GRANULARITIES
+    ]
+
+
+async def apply_rollup(updates: list):
+    """
+    Write rollup changes. A failure here must not fail the booking or training date write that caused it,
+    so it is only logged; migration 0002 rebuilds the rollup from the training dates.
+    """
+    if not updates:
+        return
+    try:
+        await availability_collection.bulk_write(updates, ordered=False)
+    except PyMongoError as e:
+        logger.error(f"[Availability] Could not update the availability rollup: {e}")
+
+
+async def record_training_date(training_date: dict, sign: int = 1, instructor: str = None):
+    """Add (sign=1) or remove (sign=-1) a training date and its free slots from the rollup."""
+    await apply_rollup(rollup_updates(training_date, sign, sign * training_date["available_slots"], instructor))
+
+
+async def record_slots(training_date: dict, free_slots: int):
+    await apply_rollup(rollup_updates(training_date, free_slots=free_slots))
+
+
+async def rename_instructor(training_id, instructor: str):
+    await availability_collection.update_many({"training_id": training_id}, {"$set": {"instructor": instructor}})
@@ -1,35 +1,279 @@
 import asyncio
+import collections
+import datetime
+import logging
+import queue
 import smtplib
-from email.mime.text import MIMEText
+import time
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.multipart import MIMEMultipart
-import logging
+from email.mime.text import MIMEText
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import PyMongoError
 
 from utils.config import settings
+from utils.database import outbox_collection
 
 logger = logging.getLogger(__name__)
 
+# Reuse an idle connection only after checking that the server has not dropped it
+IDLE_CHECK_SECONDS = 30
+# How long a claimed mail stays with a worker before another one may pick it up again
+CLAIM_LEASE = datetime.timedelta(minutes=5)
+
+
+def build_message(email: str, subject: str, message: str) -> MIMEMultipart:
+    msg = MIMEMultipart()
+    msg["From"] = settings.EMAIL_USERNAME
+    msg["To"] = email
+    msg["Subject"] = subject
+    msg.attach(MIMEText(message, "plain"))
+    return msg
+
+
+def outbox_document(email: str, subject: str, message: str) -> dict:
+    now = datetime.datetime.now(datetime.UTC)
+    return {"to": email, "subject": subject, "body": message, "status": "pending", "attempts": 0,
+            "next_attempt_at": now, "created_at": now}
 
-async def send_email_async(email: str, subject: str, message: str):
+
+async def enqueue_email(email: str, subject: str, message: str):
+    """Store a mail in the outbox; the outbox worker delivers it."""
+    await enqueue_emails([(email, subject, message)])
+
+
+async def enqueue_emails(mails: list[tuple[str, str, str]]):
+    if not mails:
+        return
     try:
+        await outbox_collection.insert_many([outbox_document(*mail) for mail in mails], ordered=False)
+    except PyMongoError as e:
+        logger.error(f"[Email] Could not queue {len(mails)} email(s): {e}")
+        return
+    email_worker.wake()
+
+
+class SMTPConnectionPool:
+    """
+    Persistent, logged-in SMTP connections shared by the delivery threads, so STARTTLS and login
+    run once per connection instead of once per mail.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.opened = 0
+        self._idle = queue.LifoQueue()
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT_SECONDS)
+        try:
+            if settings.SMTP_STARTTLS:
+                server.starttls()
+            if settings.EMAIL_USERNAME and settings.EMAIL_PASSWORD:
+                server.login(settings.EMAIL_USERNAME, settings.EMAIL_PASSWORD)
+        except Exception:
+            server.close()
+            raise
+        self.opened += 1
+        return server
+
+    def acquire(self) -> smtplib.SMTP:
+        try:
+            server, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+        if time.monotonic() - last_used > IDLE_CHECK_SECONDS:
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except smtplib.SMTPException:
+                pass
+            server.close()
+            return self._connect()
+        return server
+
+    def release(self, server: smtplib.SMTP):
+        if self._idle.qsize() < self.size:
+            self._idle.put((server, time.monotonic()))
+        else:
+            self.discard(server)
+
+    @staticmethod
+    def discard(server: smtplib.SMTP):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def close(self):
+        while not self._idle.empty():
+            self.discard(self._idle.get_nowait()[0])
+
+
+def _is_permanent(error: Exception) -> bool:
+    """5xx replies (unknown recipient, rejected content) will fail the same way on every retry."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500 \
+        and not isinstance(error, smtplib.SMTPAuthenticationError)
+
+
+class OutboxWorker:
+    """
+    Delivers the email outbox in the background: claims due mails in batches, sends them over pooled
+    SMTP connections, and reschedules failures with exponential backoff. Sends at most `max_per_minute` mails a
+    minute; the budget is per process, every API worker process has one of its own.
+    """
+
+    def __init__(self, pool_size: int, batch_size: int, max_per_minute: int):
+        self.pool = SMTPConnectionPool(pool_size)
+        self.batch_size = batch_size
+        self.max_per_minute = max_per_minute
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self._recent = collections.deque()
+        self._wakeup = asyncio.Event()
+        self._executor = None
+        self._task = None
+
+    def start(self):
+        if not settings.SMTP_SERVER:
+            logger.warning("[Email] SMTP_SERVER is not set, queued emails will not be delivered.")
+            return
+        if self._task is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.pool.size, thread_name_prefix="smtp")
+            self._task = asyncio.create_task(self.run())
+            logger.info(f"[Email] Outbox worker started with {self.pool.size} SMTP connections.")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            # Waits for in-flight SMTP sends, which may take up to SMTP_TIMEOUT_SECONDS
+            await asyncio.to_thread(self._executor.shutdown, True)
+            self.pool.close()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _budget(self) -> int:
+        cutoff = time.monotonic() - 60
+        while self._recent and self._recent[0] < cutoff:
+            self._recent.popleft()
+        return self.max_per_minute - len(self._recent)
+
+    async def run(self):
+        while True:
+            try:
+                budget = self._budget()
+                if budget <= 0:
+                    await asyncio.sleep(self._recent[0] + 60 - time.monotonic())
+                    continue
+                batch = await self._claim(min(self.batch_size, budget))
+                if batch:
+                    await self._deliver(batch)
+                    continue
+            except PyMongoError as e:
+                logger.warning(f"[Email] Outbox worker could not reach the database: {e}")
+            # Nothing due: sleep until the poll interval passes or a mail is queued by this process
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.EMAIL_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _claim(self, limit: int) -> list[dict]:
+        """Take up to `limit` due mails, one atomic update each so several workers never send the same mail."""
+        batch = []
+        now = datetime.datetime.now(datetime.UTC)
+        for _ in range(limit):
+            document = await outbox_collection.find_one_and_update(
+                {"$or": [{"status": "pending", "next_attempt_at": {"$lte": now}},
+                         {"status": "sending", "locked_until": {"$lte": now}}]},
+                {"$set": {"status": "sending", "locked_until": now + CLAIM_LEASE}},
+                sort=[("next_attempt_at", 1)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if not document:
+                break
+            batch.append(document)
+        return batch
+
+    def _send_chunk(self, documents: list[dict]) -> list:
+        """Send mails over one pooled connection. Runs in a delivery thread; returns an error or None per mail."""
+        results = []
+        server = None
+        for document in documents:
+            msg = build_message(document["to"], document["subject"], document["body"])
+            for attempt in range(2):
+                try:
+                    if server is None:
+                        server = self.pool.acquire()
+                    server.send_message(msg)
+                    results.append(None)
+                    break
+                except (smtplib.SMTPServerDisconnected, ConnectionError) as e:
+                    # The server dropped an idle connection; reconnect once before giving up on this mail
+                    if server is not None:
+                        server.close()
+                        server = None
+                    if attempt:
+                        results.append(e)
+                except Exception as e:
+                    results.append(e)
+                    break
+        if server is not None:
+            self.pool.release(server)
+        return results
+
+    async def _deliver(self, batch: list[dict]):
         loop = asyncio.get_running_loop()
-        await loop.run_in_executor(None, send_email_sync, email, subject, message)
-    except Exception as e:
-        logger.error(f"[Email] Failed to send email to {email}: {e}")
+        chunks = [batch[i::self.pool.size] for i in range(self.pool.size)]
+        outcomes = await asyncio.gather(*(loop.run_in_executor(self._executor, self._send_chunk, chunk)
+                                          for chunk in chunks if chunk))
 
+        now = datetime.datetime.now(datetime.UTC)
+        updates = []
+        for chunk, results in zip([chunk for chunk in chunks if chunk], outcomes):
+            for document, error in zip(chunk, results):
+                self._recent.append(time.monotonic())
+                attempts = document["attempts"] + 1
+                if error is None:
+                    self.sent += 1
+                    update = {"status": "sent", "sent_at": now, "attempts": attempts}
+                elif _is_permanent(error) or attempts >= settings.EMAIL_MAX_ATTEMPTS:
+                    self.failed += 1
+                    logger.error(f"[Email] Giving up on email to {document['to']} after {attempts} attempt(s): {error}")
+                    update = {"status": "failed", "attempts": attempts, "last_error": str(error)}
+                else:
+                    self.retried += 1
+                    delay = min(settings.EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1), 6 * 60 * 60)
+                    logger.warning(f"[Email] Email to {document['to']} failed, retrying in {delay}s: {error}")
+                    update = {"status": "pending", "attempts": attempts, "last_error": str(error),
+                              "next_attempt_at": now + datetime.timedelta(seconds=delay)}
+                updates.append(UpdateOne({"_id": document["_id"]}, {"$set": update, "$unset": {"locked_until": ""}}))
+        await outbox_collection.bulk_write(updates, ordered=False)
+        logger.info(f"[Email] Delivered a batch of {len(batch)} email(s).")
 
-def send_email_sync(email: str, subject: str, message: str):
-    try:
-        msg = MIMEMultipart()
-        msg["From"] = settings.EMAIL_USERNAME
-        msg["To"] = email
-        msg["Subject"] = subject
-
-        msg.attach(MIMEText(message, "plain"))
-
-        with smtplib.SMTP(settings.SMTP_SERVER, settings.SMTP_PORT) as server:
-            server.starttls()
-            server.login(settings.EMAIL_USERNAME, settings.EMAIL_PASSWORD)
-            server.send_message(msg)
-        logger.info(f"[Email] Email sent to {email}")
-    except Exception as e:
-        logger.exception(f"[Email] Exception while sending email to {email}: {e}")
+    async def stats(self) -> dict:
+        counts = {row["_id"]: row["count"] async for row in outbox_collection.aggregate(
+            [{"$group": {"_id": "$status", "count": {"$sum": 1}}}])}
+        return {
+            "running": self._task is not None,
+            "connections_opened": self.pool.opened,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "sent_last_minute": self.max_per_minute - self._budget(),
+            "max_per_minute": self.max_per_minute,
+            "outbox": counts,
+        }
+
+
+email_worker = OutboxWorker(settings.EMAIL_POOL_SIZE, settings.EMAIL_BATCH_SIZE, settings.EMAIL_MAX_PER_MINUTE)
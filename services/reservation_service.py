@@ -0,0 +1,72 @@
+import logging
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+from services.availability_service import record_slots
+from services.slot_feed import slot_feed
+from utils.database import training_dates_collection
+from utils.response_cache import catalog_cache
+
+logger = logging.getLogger(__name__)
+
+
+async def reserve_slots(training_date_id: ObjectId, count: int = 1) -> dict:
+    """
+    Atomically take `count` slots from a training date, only if enough are left.
+    Returns the updated training date.
+    """
+    training_date = await training_dates_collection.find_one_and_update(
+        {"_id": training_date_id, "available_slots": {"$gte": count}},
+        {"$inc": {"available_slots": -count}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if training_date:
+        catalog_cache.invalidate("training_dates")
+        slot_feed.publish_local(training_date)
+        await record_slots(training_date, -count)
+        return training_date
+
+    # Only the failure path pays for telling "not found" and "sold out" apart
+    if not await training_dates_collection.find_one({"_id": training_date_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Training date not found")
+    raise HTTPException(status_code=400, detail="No available slots for this training date")
+
+
+async def reserve_available_slots(training_date_id: ObjectId, count: int) -> tuple[int, dict]:
+    """
+    Atomically take up to `count` slots from a training date, as many as are left.
+    Returns the number of slots taken, which may be 0, and the training date as it was before.
+    """
+    training_date = await training_dates_collection.find_one_and_update(
+        {"_id": training_date_id},
+        [{"$set": {"available_slots": {"$max": [0, {"$subtract": ["$available_slots", count]}]}}}],
+        return_document=ReturnDocument.BEFORE,
+    )
+    if not training_date:
+        raise HTTPException(status_code=404, detail="Training date not found")
+
+    taken = min(count, max(0, training_date["available_slots"]))
+    if taken:
+        catalog_cache.invalidate("training_dates")
+        slot_feed.publish_local(training_date, training_date["available_slots"] - taken)
+        await record_slots(training_date, -taken)
+    return taken, training_date
+
+
+async def release_slots(training_date_id: ObjectId, count: int = 1):
+    """
+    Give `count` slots back to a training date, e.g. after a cancellation or a failed booking.
+    """
+    training_date = await training_dates_collection.find_one_and_update(
+        {"_id": training_date_id},
+        {"$inc": {"available_slots": count}},
+        return_document=ReturnDocument.AFTER,
+    )
+    catalog_cache.invalidate("training_dates")
+    if not training_date:
+        logger.warning(f"[Reservation] Could not release {count} slot(s), training date {training_date_id} is gone")
+        return
+    slot_feed.publish_local(training_date)
+    await record_slots(training_date, count)
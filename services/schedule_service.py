@@ -0,0 +1,65 @@
+import datetime
+
+from fastapi import HTTPException
+
+from models.training_date import TrainingDateRecurrence
+from utils.config import settings
+
+# /trainings/time-period relies on it to bound its scan of the start dates
+MAX_SESSION_LENGTH = datetime.timedelta(days=settings.MAX_SESSION_DAYS)
+
+
+def session_error(start_date: datetime.datetime, end_date: datetime.datetime) -> str:
+    """Why a training date with these dates cannot be stored, or None."""
+    if start_date >= end_date:
+        return "Start date must be before end date"
+    if end_date - start_date > MAX_SESSION_LENGTH:
+        return f"A training date cannot last longer than {settings.MAX_SESSION_DAYS} days"
+    return None
+
+
+def _session_days(rule: TrainingDateRecurrence):
+    """Every day the rule falls on, ignoring until, count and exceptions; ends with OverflowError at date.max."""
+    first_day = rule.first_start.date()
+    if rule.frequency == "daily":
+        step = datetime.timedelta(days=rule.interval)
+        day = first_day
+        while True:
+            yield day
+            day += step
+    weekdays = sorted(set(rule.weekdays) or {first_day.weekday()})
+    step = datetime.timedelta(weeks=rule.interval)
+    week = first_day - datetime.timedelta(days=first_day.weekday())
+    while True:
+        for weekday in weekdays:
+            day = week + datetime.timedelta(days=weekday)
+            if day >= first_day:
+                yield day
+        week += step
+
+
+def expand_recurrence(rule: TrainingDateRecurrence, max_sessions: int) -> list[tuple]:
+    """
+    (start, end) pairs of every session described by `rule`, in order.
+    Raises a 400 instead of producing more than `max_sessions`.
+    """
+    duration = datetime.timedelta(hours=rule.duration_hours)
+    exceptions = set(rule.exceptions)
+    first_day = rule.first_start.date()
+
+    sessions = []
+    try:
+        for day in _session_days(rule):
+            if rule.count is not None and len(sessions) == rule.count:
+                break
+            if rule.until is not None and day > rule.until:
+                break
+            if day in exceptions:
+                continue
+            if len(sessions) == max_sessions:
+                raise HTTPException(status_code=400, detail=f"Recurrence creates more than {max_sessions} sessions")
+            start = rule.first_start + (day - first_day)
+            sessions.append((start, start + duration))
+    except OverflowError:
+        raise HTTPException(status_code=400, detail="Recurrence runs past the last supported date")
+    return sessions
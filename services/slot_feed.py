@@ -0,0 +1,151 @@
+import asyncio
+import logging
+
+from fastapi import HTTPException
+from pymongo.errors import OperationFailure, PyMongoError
+
+from utils.config import settings
+from utils.database import training_dates_collection
+from utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+# Server error code of resuming a change stream whose position has left the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+
+# Only what the subscribers are sent; the rest of the looked up document is dropped by the server
+CHANGE_PIPELINE = [
+    {"$match": {"$or": [
+        {"operationType": {"$in": ["insert", "replace"]}},
+        {"operationType": "update", "updateDescription.updatedFields.available_slots": {"$exists": True}},
+    ]}},
+    {"$project": {"fullDocument._id": 1, "fullDocument.training_id": 1, "fullDocument.available_slots": 1}},
+]
+
+
+def slot_event(training_date: dict, available_slots: int = None) -> dict:
+    return {
+        "id": str(training_date["_id"]),
+        "training_id": str(training_date["training_id"]),
+        "available_slots": training_date["available_slots"] if available_slots is None else available_slots,
+    }
+
+
+def format_event(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: ".encode() + dumps(data) + b"\n\n"
+
+
+class Subscriber:
+    def __init__(self, training_id: str, queue_size: int):
+        self.training_id = training_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.evicted = False
+
+
+class SlotFeed:
+    """
+    Fans out changes of the available slots of training dates to the open event streams of this worker.
+    One change stream on training_dates feeds all subscribers; without change streams (standalone mongod)
+    the reservation service publishes its own changes instead. Every subscriber has a bounded queue, and a
+    subscriber that lets it fill up is evicted rather than slowing down or growing the feed.
+    """
+
+    def __init__(self, queue_size: int, max_subscribers: int):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.subscribers: set[Subscriber] = set()
+        self.watching = False
+        self.published = 0
+        self.evicted = 0
+
+    def full(self) -> bool:
+        return len(self.subscribers) >= self.max_subscribers
+
+    def check_capacity(self):
+        """Reject a stream before its response starts; the slot itself is only taken once it does."""
+        if self.full():
+            raise HTTPException(status_code=503, detail="Too many open streams, try again later")
+
+    def subscribe(self, training_id: str = None) -> Subscriber:
+        subscriber = Subscriber(training_id, self.queue_size)
+        self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish(self, event: dict):
+        self.published += 1
+        for subscriber in list(self.subscribers):
+            if subscriber.training_id and subscriber.training_id != event["training_id"]:
+                continue
+            try:
+                subscriber.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscriber.evicted = True
+                self.subscribers.discard(subscriber)
+                self.evicted += 1
+
+    def publish_local(self, training_date: dict, available_slots: int = None):
+        """Called after every slot change of this worker; the change stream reports them while it runs."""
+        if not self.watching and self.subscribers:
+            self.publish(slot_event(training_date, available_slots))
+
+    async def events(self, training_id: str = None):
+        """
+        The server-sent events of one subscriber, with a comment line as keep-alive while nothing changes.
+        Subscribes on the first iteration, so a response that is never sent holds no slot.
+        """
+        if self.full():
+            # Filled up since check_capacity(), and the status line is already sent
+            yield format_event("unavailable", {"detail": "Too many open streams, try again later"})
+            return
+        subscriber = self.subscribe(training_id)
+        try:
+            while not subscriber.evicted:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), settings.SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keep-alive\n\n"
+                    continue
+                yield format_event("slots", event)
+            # Changes were dropped, so the client has to reload the dates before it listens again
+            yield format_event("evicted", {"detail": "The stream fell behind, reload and reconnect"})
+        finally:
+            self.unsubscribe(subscriber)
+
+    async def watch(self):
+        resume_token = None
+        while True:
+            try:
+                async with training_dates_collection.watch(CHANGE_PIPELINE, full_document="updateLookup",
+                                                           resume_after=resume_token) as stream:
+                    self.watching = True
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        if change.get("fullDocument"):
+                            self.publish(slot_event(change["fullDocument"]))
+            except OperationFailure as e:
+                self.watching = False
+                if resume_token is not None and e.code == CHANGE_STREAM_HISTORY_LOST:
+                    logger.warning("[Slots] Change stream could not resume, changes since the interruption are lost.")
+                    resume_token = None
+                    continue
+                logger.info(f"[Slots] Change streams unavailable ({e.code}), publishing local changes only.")
+                return
+            except PyMongoError as e:
+                # Local changes still reach this worker's subscribers while the stream is down
+                self.watching = False
+                logger.warning(f"[Slots] Change stream interrupted: {e}")
+                await asyncio.sleep(settings.SSE_HEARTBEAT_SECONDS)
+
+    def stats(self) -> dict:
+        return {
+            "source": "change_stream" if self.watching else "local",
+            "subscribers": len(self.subscribers),
+            "published": self.published,
+            "evicted": self.evicted,
+        }
+
+
+slot_feed = SlotFeed(settings.SSE_QUEUE_SIZE, settings.SSE_MAX_SUBSCRIBERS)
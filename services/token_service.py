@@ -0,0 +1,130 @@
+import asyncio
+import datetime
+import hashlib
+import logging
+
+from fastapi import HTTPException
+from jose import jwt, JWTError
+from pymongo.errors import PyMongoError
+
+from utils.bloom import BloomFilter
+from utils.config import settings
+from utils.database import tokens_collection
+
+logger = logging.getLogger(__name__)
+
+# Revocations are synced by their revoked_at, which is set by the app servers; re-reading this much of the
+# past on every sync covers clock differences between them and inserts that commit out of order
+SYNC_OVERLAP = datetime.timedelta(seconds=60)
+
+
+def revocation_key(token: str, claims: dict) -> str:
+    """Refresh tokens are revoked by their jti, tokens issued before jti existed by their SHA-256."""
+    return claims.get("jti") or hashlib.sha256(token.encode()).hexdigest()
+
+
+class RevocationList:
+    """
+    Bloom filter over the keys of all revoked refresh tokens, synced from the revoked_tokens collection.
+    A key that is not in the filter was not revoked as of the last sync, so the common case needs no
+    database round trip; only filter hits are confirmed with a lookup.
+    """
+
+    def __init__(self):
+        self.filter: BloomFilter = None
+        self.synced_until: datetime.datetime = None
+        self.rebuilds = 0
+        self.lookups = 0
+        self.skipped_lookups = 0
+
+    async def load(self):
+        """Rebuild the filter from scratch, sized for the current number of revoked tokens."""
+        synced_until = datetime.datetime.now(datetime.UTC)
+        count = await tokens_collection.estimated_document_count()
+        bloom = BloomFilter(max(settings.REVOKED_TOKEN_FILTER_CAPACITY, 2 * count),
+                            settings.REVOKED_TOKEN_FILTER_ERROR_RATE)
+        # Hashing millions of keys takes tens of seconds of CPU: do it in a worker thread, batch by batch, and
+        # only swap the filter in once it is complete
+        cursor = tokens_collection.find({}, {"_id": 1}, batch_size=10000)
+        while batch := await cursor.to_list(length=10000):
+            await asyncio.to_thread(bloom.update, (str(document["_id"]) for document in batch))
+        self.filter = bloom
+        self.synced_until = synced_until
+        self.rebuilds += 1
+        logger.info(f"[Tokens] Loaded {len(bloom)} revoked tokens into a {len(bloom.bits) // 1024} KiB filter.")
+
+    async def sync(self):
+        """Add the tokens revoked since the last sync, by this or any other process."""
+        synced_until = datetime.datetime.now(datetime.UTC)
+        async for document in tokens_collection.find({"revoked_at": {"$gt": self.synced_until - SYNC_OVERLAP}},
+                                                     {"_id": 1}):
+            self.filter.add(str(document["_id"]))
+        self.synced_until = synced_until
+        # Expired revocations are only dropped from the filter by a rebuild
+        if len(self.filter) > self.filter.capacity:
+            await self.load()
+
+    async def watch(self):
+        """Load the filter, then keep it in sync. Until the first load succeeds every check asks the database."""
+        while True:
+            try:
+                if self.filter is None:
+                    await self.load()
+                else:
+                    await self.sync()
+            except PyMongoError as e:
+                logger.warning(f"[Tokens] Syncing revoked tokens failed: {e}")
+            await asyncio.sleep(settings.REVOKED_TOKEN_SYNC_SECONDS)
+
+    async def is_revoked(self, key: str) -> bool:
+        if self.filter is not None and key not in self.filter:
+            self.skipped_lookups += 1
+            return False
+        self.lookups += 1
+        return await tokens_collection.find_one({"_id": key}, {"_id": 1}) is not None
+
+    async def revoke(self, key: str, expires_at: datetime.datetime):
+        # Upsert so revoking the same token twice is not an error; the TTL index removes it once it expires
+        await tokens_collection.update_one(
+            {"_id": key},
+            {"$setOnInsert": {"expires_at": expires_at, "revoked_at": datetime.datetime.now(datetime.UTC)}},
+            upsert=True,
+        )
+        if self.filter is not None:
+            self.filter.add(key)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.filter is not None,
+            "revoked_tokens": len(self.filter) if self.filter is not None else None,
+            "capacity": self.filter.capacity if self.filter is not None else None,
+            "filter_bytes": len(self.filter.bits) if self.filter is not None else None,
+            "synced_until": self.synced_until,
+            "rebuilds": self.rebuilds,
+            "lookups": self.lookups,
+            "skipped_lookups": self.skipped_lookups,
+        }
+
+
+revocation_list = RevocationList()
+
+
+async def check_refresh_token(token: str) -> dict:
+    """Decode a refresh token and make sure it has not been revoked. Returns its claims."""
+    try:
+        claims = jwt.decode(token, settings.REFRESH_SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    if await revocation_list.is_revoked(revocation_key(token, claims)):
+        raise HTTPException(status_code=401, detail="Refresh token revoked")
+    return claims
+
+
+async def revoke_refresh_token(token: str):
+    try:
+        claims = jwt.decode(token, settings.REFRESH_SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        # Expired or forged tokens cannot be used anyway
+        return
+    await revocation_list.revoke(revocation_key(token, claims),
+                                 datetime.datetime.fromtimestamp(claims["exp"], datetime.UTC))
@@ -0,0 +1,59 @@
+import datetime
+import os
+
+# Read by utils.config on import: a database of its own, no log files and rate limit counters in memory
+os.environ["MONGO_DB_NAME"] = "training_provider_test"
+os.environ["LOG_DIR"] = ""
+os.environ["RATE_LIMIT_STORAGE_URI"] = "memory://"
+
+import pytest
+from fastapi.testclient import TestClient
+
+from benchmarks.in_memory import install
+
+# The tests run against the mongomock-motor stand-in, so they need no mongod
+install()
+
+
+@pytest.fixture(scope="session")
+def client():
+    from main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def database(client):
+    from utils.database import client as mongo_client
+    from utils.response_cache import catalog_cache
+
+    database = mongo_client[os.environ["MONGO_DB_NAME"]]
+    yield database
+
+    async def clear():
+        for name in ("trainings", "training_dates", "bookings"):
+            await database[name].delete_many({})
+
+    client.portal.call(clear)
+    # The tests write around the routes, so nothing else tells the cache
+    catalog_cache.invalidate("trainings", "training_dates")
+
+
+@pytest.fixture
+def admin(client, database):
+    """Bearer headers of an admin user, who owns what they create."""
+    from routes.v1.auth import create_access_token
+
+    async def insert():
+        await database.users.update_one(
+            {"email": "admin@example.com"},
+            {"$setOnInsert": {"password": "", "roles": ["admin"], "permissions": [],
+                              "created_at": datetime.datetime.now(datetime.UTC)}},
+            upsert=True,
+        )
+        user = await database.users.find_one({"email": "admin@example.com"}, {"_id": 1})
+        return str(user["_id"])
+
+    user_id = client.portal.call(insert)
+    return {"authorization": f"Bearer {create_access_token({'sub': user_id})}"}
@@ -0,0 +1,18 @@
+import pymongo
+
+from utils.config import settings
+from utils.database import client_options
+
+
+def test_zero_disables_timeouts_except_server_selection(monkeypatch):
+    for name in ("MONGO_MAX_IDLE_TIME_MS", "MONGO_WAIT_QUEUE_TIMEOUT_MS", "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+                 "MONGO_CONNECT_TIMEOUT_MS", "MONGO_SOCKET_TIMEOUT_MS"):
+        monkeypatch.setattr(settings, name, 0)
+
+    options = client_options()
+    client = pymongo.MongoClient("mongodb://localhost:27017", connect=False, **options)
+
+    assert options["maxIdleTimeMS"] is options["waitQueueTimeoutMS"] is None
+    assert options["connectTimeoutMS"] is options["socketTimeoutMS"] is None
+    assert client.options.server_selection_timeout == 0
+    client.close()
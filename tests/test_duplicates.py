@@ -0,0 +1,41 @@
+from routes.v1 import auth, trainings
+
+
+def training(name: str) -> dict:
+    return {"name": name, "description": "A training", "price": 100, "instructor": "Ada", "duration_hours": 8}
+
+
+async def not_found(*args, **kwargs):
+    return None
+
+
+def test_renaming_a_training_to_a_taken_name_is_rejected(client, admin):
+    client.post("/api/v1/trainings/", json=training("Python"), headers=admin)
+    other = client.post("/api/v1/trainings/", json=training("Go"), headers=admin).json()["id"]
+
+    response = client.put("/api/v1/trainings/", json={**training("Python"), "id": other, "created_by": "x"},
+                          headers=admin)
+
+    assert response.status_code == 400
+    assert response.json() == {"message": "Training with this name already exists"}
+
+
+def test_concurrent_training_creation_is_rejected(client, admin, monkeypatch):
+    assert client.post("/api/v1/trainings/", json=training("Python"), headers=admin).status_code == 200
+    # The other request passed the name check before this one inserted
+    monkeypatch.setattr(trainings.trainings_collection, "find_one", not_found)
+
+    response = client.post("/api/v1/trainings/", json=training("Python"), headers=admin)
+
+    assert response.status_code == 400
+    assert response.json() == {"message": "Training with this name already exists"}
+
+
+def test_concurrent_registration_is_rejected(client, admin, monkeypatch):
+    # admin@example.com exists; the other request passed the email check before it was inserted
+    monkeypatch.setattr(auth.users_collection, "find_one", not_found)
+
+    response = client.post("/api/v1/auth/register", json={"email": "admin@example.com", "password": "secret"})
+
+    assert response.status_code == 400
+    assert response.json() == {"message": "Email already registered"}
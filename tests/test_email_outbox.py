@@ -0,0 +1,195 @@
+import asyncio
+import datetime
+import socket
+import time
+
+import pytest
+import pytest_asyncio
+from aiosmtpd.controller import Controller
+
+from services.email_service import OutboxWorker, enqueue_emails
+from utils.config import settings
+from utils.database import outbox_collection
+
+RETRY_BASE_SECONDS = 60
+
+
+class RecordingHandler:
+    """Accepts every mail except to unknown@ (550) and busy@ (451), and remembers the connections it served."""
+
+    def __init__(self):
+        self.messages = []
+        self.sessions = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        self.sessions.add(session)
+        if address.startswith("unknown@"):
+            return "550 No such user"
+        if address.startswith("busy@"):
+            return "451 Mailbox busy, try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages.append((envelope.rcpt_tos, envelope.content.decode()))
+        return "250 Message accepted for delivery"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp(monkeypatch):
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=free_port())
+    controller.start()
+    monkeypatch.setattr(settings, "SMTP_SERVER", controller.hostname)
+    monkeypatch.setattr(settings, "SMTP_PORT", controller.port)
+    monkeypatch.setattr(settings, "SMTP_STARTTLS", False)
+    monkeypatch.setattr(settings, "EMAIL_USERNAME", "noreply@example.com")
+    monkeypatch.setattr(settings, "EMAIL_PASSWORD", None)
+    monkeypatch.setattr(settings, "EMAIL_RETRY_BASE_SECONDS", RETRY_BASE_SECONDS)
+    yield handler
+    controller.stop()
+
+
+@pytest_asyncio.fixture
+async def outbox():
+    await outbox_collection.delete_many({})
+    yield outbox_collection
+    await outbox_collection.delete_many({})
+
+
+@pytest_asyncio.fixture
+async def start_worker(smtp):
+    workers = []
+
+    def start(pool_size: int = 1, max_per_minute: int = 100) -> OutboxWorker:
+        worker = OutboxWorker(pool_size, batch_size=10, max_per_minute=max_per_minute)
+        worker.start()
+        workers.append(worker)
+        return worker
+
+    yield start
+    for worker in workers:
+        await worker.stop()
+
+
+async def statuses(outbox) -> dict:
+    return {document["to"]: document["status"] async for document in outbox.find()}
+
+
+async def wait_until(condition, timeout: float = 5):
+    deadline = time.monotonic() + timeout
+    while not await condition():
+        assert time.monotonic() < deadline, "timed out"
+        await asyncio.sleep(0.02)
+
+
+def seconds_until(moment: datetime.datetime) -> float:
+    # The stand-in database returns naive datetimes in UTC
+    return (moment.replace(tzinfo=None) - datetime.datetime.now(datetime.UTC).replace(tzinfo=None)).total_seconds()
+
+
+@pytest.mark.asyncio
+async def test_delivers_queued_mails(smtp, outbox, start_worker):
+    await enqueue_emails([("anna@example.com", "Booking confirmed", "See you on Monday")])
+    worker = start_worker()
+
+    async def sent():
+        return await statuses(outbox) == {"anna@example.com": "sent"}
+
+    await wait_until(sent)
+    [(recipients, content)] = smtp.messages
+    assert recipients == ["anna@example.com"]
+    assert "Subject: Booking confirmed" in content
+    assert "See you on Monday" in content
+    assert worker.sent == 1
+
+
+@pytest.mark.asyncio
+async def test_reuses_the_connection_across_mails(smtp, outbox, start_worker):
+    await enqueue_emails([(f"user{i}@example.com", "Hello", "Body") for i in range(3)])
+    worker = start_worker(pool_size=1)
+    await wait_until(lambda: asyncio.sleep(0, worker.sent == 3))
+    await enqueue_emails([("late@example.com", "Hello", "Body")])
+    # enqueue_emails() wakes the app's worker, not this one
+    worker.wake()
+    await wait_until(lambda: asyncio.sleep(0, worker.sent == 4))
+
+    assert len(smtp.messages) == 4
+    assert len(smtp.sessions) == 1
+    assert worker.pool.opened == 1
+
+
+@pytest.mark.asyncio
+async def test_sends_at_most_max_per_minute(smtp, outbox, start_worker):
+    await enqueue_emails([(f"user{i}@example.com", "Hello", "Body") for i in range(3)])
+    worker = start_worker(max_per_minute=2)
+
+    await wait_until(lambda: asyncio.sleep(0, worker.sent == 2))
+    # Give the worker the chance to send more than it may
+    await asyncio.sleep(0.2)
+
+    assert sorted((await statuses(outbox)).values()) == ["pending", "sent", "sent"]
+    assert len(smtp.messages) == 2
+    assert (await worker.stats())["sent_last_minute"] == 2
+
+
+@pytest.mark.asyncio
+async def test_marks_permanent_failures(smtp, outbox, start_worker):
+    await enqueue_emails([("unknown@example.com", "Hello", "Body")])
+    worker = start_worker()
+
+    await wait_until(lambda: asyncio.sleep(0, worker.failed == 1))
+
+    document = await outbox.find_one({"to": "unknown@example.com"})
+    assert document["status"] == "failed"
+    assert document["attempts"] == 1
+    assert "No such user" in document["last_error"]
+    assert smtp.messages == []
+
+
+@pytest.mark.asyncio
+async def test_retries_temporary_failures_with_backoff(smtp, outbox, start_worker):
+    await enqueue_emails([("busy@example.com", "Hello", "Body")])
+    worker = start_worker()
+
+    for attempts in (1, 2, 3):
+        await wait_until(lambda: asyncio.sleep(0, worker.retried == attempts))
+        document = await outbox.find_one({"to": "busy@example.com"})
+        assert document["status"] == "pending"
+        assert document["attempts"] == attempts
+        delay = RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+        assert delay - 5 < seconds_until(document["next_attempt_at"]) <= delay
+        if attempts < 3:
+            # Make the retry due now instead of waiting for it
+            await outbox.update_one({"_id": document["_id"]},
+                                    {"$set": {"next_attempt_at": datetime.datetime.now(datetime.UTC)}})
+            worker.wake()
+
+
+@pytest.mark.asyncio
+async def test_stop_waits_for_sends_without_blocking_the_loop(smtp, outbox):
+    worker = OutboxWorker(1, batch_size=10, max_per_minute=100)
+    worker.start()
+    # Let the worker go idle first, then stand in for a slow SMTP send
+    await asyncio.sleep(0.1)
+    send = worker._executor.submit(time.sleep, 0.5)
+    ticks = 0
+
+    async def tick():
+        nonlocal ticks
+        while True:
+            await asyncio.sleep(0.01)
+            ticks += 1
+
+    ticker = asyncio.create_task(tick())
+    await worker.stop()
+    ticker.cancel()
+
+    assert send.done()
+    assert ticks > 10
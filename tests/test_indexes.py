@@ -0,0 +1,72 @@
+import pytest
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+import utils.database as database
+
+NAME_UNIQUE = IndexModel([("name", ASCENDING)], name="name_unique", unique=True)
+
+
+class FakeCollection:
+    """Just the index commands, with the conflict errors of a real server."""
+
+    def __init__(self, name: str, indexes: list[dict], duplicates: bool = False):
+        self.name = name
+        self.indexes = {index["name"]: index for index in indexes}
+        self.duplicates = duplicates
+
+    async def list_indexes(self):
+        for index in list(self.indexes.values()):
+            yield index
+
+    async def drop_index(self, name: str):
+        if name not in self.indexes:
+            raise OperationFailure("index not found", code=27)
+        del self.indexes[name]
+
+    async def create_indexes(self, models: list[IndexModel]):
+        for model in models:
+            document = {**model.document, "key": dict(model.document["key"])}
+            for existing in self.indexes.values():
+                if existing["name"] == document["name"] and existing != document:
+                    raise OperationFailure("index with this name exists with other options", code=86)
+                if existing["key"] == document["key"] and existing["name"] != document["name"]:
+                    raise OperationFailure("index with these keys exists under another name", code=85)
+            if document.get("unique") and self.duplicates:
+                raise DuplicateKeyError("E11000 duplicate key error")
+            self.indexes[document["name"]] = document
+
+
+async def ensure(monkeypatch, collection: FakeCollection) -> dict:
+    monkeypatch.setattr(database, "db", {collection.name: collection})
+    monkeypatch.setattr(database, "INDEXES", {collection.name: [NAME_UNIQUE]})
+    monkeypatch.setattr(database, "RETIRED_INDEXES", {})
+    await database._ensure_indexes()
+    return collection.indexes
+
+
+@pytest.mark.asyncio
+async def test_replaces_an_equal_key_index_under_another_name(monkeypatch):
+    collection = FakeCollection("trainings", [{"name": "name_1", "key": {"name": 1}}])
+
+    indexes = await ensure(monkeypatch, collection)
+
+    assert indexes == {"name_unique": {"name": "name_unique", "key": {"name": 1}, "unique": True}}
+
+
+@pytest.mark.asyncio
+async def test_replaces_an_index_of_the_same_name(monkeypatch):
+    collection = FakeCollection("trainings", [{"name": "name_unique", "key": {"name": 1}}])
+
+    indexes = await ensure(monkeypatch, collection)
+
+    assert indexes["name_unique"]["unique"] is True
+
+
+@pytest.mark.asyncio
+async def test_keeps_the_old_index_when_the_rebuild_fails(monkeypatch):
+    collection = FakeCollection("trainings", [{"name": "name_1", "key": {"name": 1}}], duplicates=True)
+
+    indexes = await ensure(monkeypatch, collection)
+
+    assert indexes == {"name_1": {"name": "name_1", "key": {"name": 1}}}
@@ -0,0 +1,84 @@
+import fakeredis
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from slowapi import _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
+from slowapi.middleware import SlowAPIMiddleware
+
+from limiter import create_limiter
+from routes.v1.auth import create_access_token
+
+LIMIT = "2/minute"
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+def redis_limiter(server):
+    # Every limiter gets its own client, like the workers of a deployment sharing one Redis
+    pool = fakeredis.FakeRedis(server=server).connection_pool
+    return create_limiter("redis://redis:6379", [LIMIT], connection_pool=pool)
+
+
+def limited_client(limiter) -> TestClient:
+    app = FastAPI()
+    app.state.limiter = limiter
+    app.add_middleware(SlowAPIMiddleware)
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+    @app.get("/ping")
+    async def ping():
+        return {}
+
+    return TestClient(app)
+
+
+def bearer(user_id: str) -> dict:
+    return {"authorization": f"Bearer {create_access_token({'sub': user_id})}"}
+
+
+def statuses(client: TestClient, count: int, headers: dict = None) -> list[int]:
+    return [client.get("/ping", headers=headers).status_code for _ in range(count)]
+
+
+def test_users_are_limited_apart_from_their_ip(redis_server):
+    client = limited_client(redis_limiter(redis_server))
+
+    assert statuses(client, 3, bearer("alice")) == [200, 200, 429]
+    # Same client address, but other callers: another user and the anonymous requests
+    assert statuses(client, 3, bearer("bob")) == [200, 200, 429]
+    assert statuses(client, 3) == [200, 200, 429]
+
+    keys = {key.decode() for key in fakeredis.FakeRedis(server=redis_server).keys()}
+    assert any("user:alice" in key for key in keys)
+    assert any("user:bob" in key for key in keys)
+    assert any("ip:testclient" in key for key in keys)
+
+
+def test_invalid_token_is_limited_per_ip(redis_server):
+    client = limited_client(redis_limiter(redis_server))
+
+    assert statuses(client, 2, {"authorization": "Bearer not-a-token"}) == [200, 200]
+    assert statuses(client, 1) == [429]
+
+
+def test_limiters_share_counters(redis_server):
+    first = limited_client(redis_limiter(redis_server))
+    second = limited_client(redis_limiter(redis_server))
+
+    assert statuses(first, 1, bearer("alice")) == [200]
+    assert statuses(second, 1, bearer("alice")) == [200]
+    assert statuses(first, 1, bearer("alice")) == [429]
+    assert statuses(second, 1, bearer("alice")) == [429]
+
+
+def test_falls_back_to_memory_without_redis():
+    # Nothing listens on port 1, so every Redis command fails
+    limiter = create_limiter("redis://127.0.0.1:1", [LIMIT])
+    client = limited_client(limiter)
+
+    assert statuses(client, 3) == [200, 200, 429]
+    assert limiter._storage_dead
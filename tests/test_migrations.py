@@ -0,0 +1,71 @@
+import datetime
+
+import pytest
+from bson import ObjectId
+
+from migrations import m0004_check_session_lengths
+from services.schedule_service import MAX_SESSION_LENGTH
+
+START = datetime.datetime(2026, 3, 1)
+
+
+def insert_date(client, database, length: datetime.timedelta):
+    async def insert():
+        document = {"training_id": "t", "start_date": START, "end_date": START + length, "location": "Online"}
+        return (await database.training_dates.insert_one(document)).inserted_id
+
+    return client.portal.call(insert)
+
+
+def test_session_lengths_within_the_bound_pass(client, database):
+    insert_date(client, database, MAX_SESSION_LENGTH)
+
+    client.portal.call(m0004_check_session_lengths.up, None, 100)
+
+
+def test_longer_sessions_stop_the_migration(client, database):
+    insert_date(client, database, datetime.timedelta(days=1))
+    too_long = insert_date(client, database, MAX_SESSION_LENGTH + datetime.timedelta(hours=1))
+
+    with pytest.raises(RuntimeError, match=f"1 training date.*{too_long}"):
+        client.portal.call(m0004_check_session_lengths.up, None, 100)
+
+
+def test_conversions_that_duplicate_a_booking_are_skipped(client, database, monkeypatch):
+    from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+    from migrations import MigrationState, m0001_normalize_reference_ids
+
+    async def unordered_bulk_write(self, requests, ordered=True, **kwargs):
+        # The stand-in stops at the first duplicate; a server running an unordered bulk write carries on
+        errors = []
+        for index, request in enumerate(requests):
+            try:
+                await self.update_one(request._filter, request._doc)
+            except DuplicateKeyError:
+                errors.append({"index": index, "code": 11000, "errmsg": "duplicate key"})
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+    date_id = ObjectId()
+
+    async def run():
+        monkeypatch.setattr(type(database.bookings), "bulk_write", unordered_bulk_write)
+        await database.migrations.delete_many({"_id": "0001"})
+        await database.migrations.insert_one({"_id": "0001", "checkpoints": {}})
+        await database.bookings.insert_many([
+            {"training_date_id": date_id, "customer_email": "ada@example.com"},
+            {"training_date_id": str(date_id), "customer_email": "ada@example.com"},
+            {"training_date_id": str(date_id), "customer_email": "bob@example.com"},
+        ])
+        state = MigrationState(await database.migrations.find_one({"_id": "0001"}))
+        await m0001_normalize_reference_ids.up(state, 100)
+        return state, await database.migrations.find_one({"_id": "0001"})
+
+    state, document = client.portal.call(run)
+    duplicate = client.portal.call(database.bookings.find_one, {"training_date_id": str(date_id)})
+
+    assert duplicate["customer_email"] == "ada@example.com"
+    assert document["skipped"] == {"bookings": [duplicate["_id"]]}
+    assert state.checkpoints["bookings"] is not None
+    assert client.portal.call(database.bookings.count_documents, {"training_date_id": date_id}) == 2
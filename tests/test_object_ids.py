@@ -0,0 +1,36 @@
+import pytest
+
+
+@pytest.mark.parametrize("path, detail", [
+    ("/api/v1/trainings/?id=nope", "Invalid id"),
+    ("/api/v1/training-dates/?id=nope", "Invalid id"),
+    ("/api/v1/training-dates/?training_id=nope", "Invalid training id"),
+    ("/api/v1/availability/?start_date=2026-01-01&end_date=2026-01-31&training_id=nope", "Invalid training id"),
+])
+def test_malformed_ids_are_rejected(client, path, detail):
+    response = client.get(path)
+
+    assert response.status_code == 400
+    assert response.json() == {"message": detail}
+
+
+@pytest.mark.parametrize("path", [
+    "/api/v1/trainings/nope",
+    "/api/v1/training-dates/nope",
+    "/api/v1/bookings/nope",
+])
+def test_malformed_path_ids_are_rejected(client, admin, path):
+    response = client.delete(path, headers=admin)
+
+    assert response.status_code == 400
+    assert response.json() == {"message": "Invalid id"}
+
+
+def test_malformed_body_ids_are_rejected(client, admin):
+    training = {"name": "Python", "description": "A training", "price": 100, "instructor": "Ada",
+                "duration_hours": 8, "id": "nope", "created_by": "x"}
+
+    response = client.put("/api/v1/trainings/", json=training, headers=admin)
+
+    assert response.status_code == 400
+    assert response.json() == {"message": "Invalid id"}
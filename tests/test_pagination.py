@@ -0,0 +1,52 @@
+import base64
+import datetime
+
+import pytest
+from bson import ObjectId
+
+
+def cursor(raw: str) -> str:
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+@pytest.mark.parametrize("path, raw", [
+    ("/api/v1/trainings/", '[{"$oid": "zz"}]'),
+    ("/api/v1/trainings/", '[{"$ne": null}]'),
+    ("/api/v1/trainings/", '["60d21b4667d0d8992e610c85"]'),
+    ("/api/v1/trainings/", '[{"$oid": "60d21b4667d0d8992e610c85"}, 1]'),
+    ("/api/v1/trainings/", "not json"),
+    ("/api/v1/training-dates/", '[{"$gt": 0}, {"$oid": "60d21b4667d0d8992e610c85"}]'),
+    ("/api/v1/training-dates/", '[{"$date": "yesterday"}, {"$oid": "60d21b4667d0d8992e610c85"}]'),
+])
+def test_malformed_cursors_are_rejected(client, path, raw):
+    response = client.get(path, params={"cursor": cursor(raw)})
+
+    assert response.status_code == 400
+    assert response.json() == {"message": "Invalid cursor"}
+
+
+def test_cursors_of_the_api_are_accepted(client, database):
+    async def insert():
+        await database.trainings.insert_many([{"name": f"Training {i}", "price": 100} for i in range(2)])
+
+    client.portal.call(insert)
+    first = client.get("/api/v1/trainings/?limit=1").json()
+
+    second = client.get("/api/v1/trainings/", params={"limit": 1, "cursor": first["next_cursor"]}).json()
+
+    assert [row["name"] for row in first["data"] + second["data"]] == ["Training 0", "Training 1"]
+
+
+def test_training_date_cursors_are_accepted(client, database):
+    async def insert():
+        await database.training_dates.insert_many([
+            {"training_id": ObjectId(), "start_date": datetime.datetime(2026, 3, day), "end_date":
+             datetime.datetime(2026, 3, day + 1), "location": "Online", "available_slots": 10} for day in (1, 2)
+        ])
+
+    client.portal.call(insert)
+    first = client.get("/api/v1/training-dates/?limit=1").json()
+
+    second = client.get("/api/v1/training-dates/", params={"limit": 1, "cursor": first["next_cursor"]}).json()
+
+    assert [row["start_date"][:10] for row in first["data"] + second["data"]] == ["2026-03-01", "2026-03-02"]
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+from fastapi import HTTPException
+
+from services.password_service import PasswordHasher, hash_password_sync, verify_password_sync
+
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(workers=1, max_queue=4)
+    yield hasher
+    hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_hashes_in_the_pool(hasher):
+    hashed = await hasher.run(hash_password_sync, "secret")
+
+    assert await hasher.run(verify_password_sync, "secret", hashed)
+    assert hasher.stats()["completed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_replaces_a_broken_pool(hasher):
+    await hasher.run(hash_password_sync, "secret")
+
+    # The worker process dies in the middle of a job
+    with pytest.raises(HTTPException) as error:
+        await hasher.run(os._exit, 1)
+    assert error.value.status_code == 503
+
+    assert await hasher.run(verify_password_sync, "secret", await hasher.run(hash_password_sync, "secret"))
+    assert hasher.stats()["completed"] == 3
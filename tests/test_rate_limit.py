@@ -0,0 +1,37 @@
+import re
+
+import pytest
+
+from limiter import create_limiter
+from main import app
+
+
+@pytest.fixture
+def low_limit(client, monkeypatch):
+    # SlowAPIMiddleware enforces the default limits of the app's limiter
+    monkeypatch.setattr(app.state, "limiter", create_limiter("memory://", ["2/minute"]))
+
+
+def rejections(client, route: str) -> float:
+    match = re.search(rf'^rate_limit_rejections_total{{route="{re.escape(route)}"}} (\S+)$',
+                      client.get("/api/metrics").text, re.MULTILINE)
+    return float(match.group(1)) if match else 0
+
+
+def test_default_limit_rejections_are_counted(client, low_limit):
+    before = rejections(client, "/api/v1/trainings/")
+
+    responses = [client.get("/api/v1/trainings/") for _ in range(3)]
+
+    assert [response.status_code for response in responses] == [200, 200, 429]
+    assert responses[-1].json() == {"message": "Rate limit exceeded. 2 per 1 minute. Try again later."}
+    assert rejections(client, "/api/v1/trainings/") == before + 1
+
+
+def test_route_limit_rejections_are_counted(client):
+    before = rejections(client, "/api/")
+
+    statuses = [client.get("/api/").status_code for _ in range(6)]
+
+    assert statuses == [200] * 5 + [429]
+    assert rejections(client, "/api/") == before + 1
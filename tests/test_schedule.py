@@ -0,0 +1,55 @@
+import datetime
+
+import pytest
+from fastapi import HTTPException
+from pydantic import ValidationError
+
+from models.training_date import TrainingDateRecurrence
+from services.schedule_service import expand_recurrence
+
+MONDAY = datetime.datetime(2026, 3, 2, 9)
+
+
+def starts(**rule) -> list[datetime.datetime]:
+    recurrence = TrainingDateRecurrence(first_start=MONDAY, duration_hours=8, **rule)
+    return [start for start, _ in expand_recurrence(recurrence, 500)]
+
+
+def test_daily_every_other_day_skips_exceptions():
+    assert starts(frequency="daily", interval=2, count=3, exceptions=[datetime.date(2026, 3, 4)]) == [
+        MONDAY, MONDAY + datetime.timedelta(days=4), MONDAY + datetime.timedelta(days=6),
+    ]
+
+
+def test_weekly_on_weekdays_until():
+    assert starts(frequency="weekly", interval=2, weekdays=[0, 3], until=datetime.date(2026, 3, 20)) == [
+        MONDAY, MONDAY + datetime.timedelta(days=3), MONDAY + datetime.timedelta(days=14),
+        MONDAY + datetime.timedelta(days=17),
+    ]
+
+
+def test_large_intervals_are_stepped_over():
+    assert starts(frequency="daily", interval=365, count=2) == [MONDAY, MONDAY + datetime.timedelta(days=365)]
+    with pytest.raises(ValidationError):
+        starts(frequency="daily", interval=100_000_000, count=2)
+
+
+@pytest.mark.parametrize("rule", [
+    {"frequency": "daily", "count": 501},
+    {"frequency": "daily", "until": datetime.date(9999, 12, 31)},
+    {"frequency": "weekly", "interval": 365, "until": datetime.date(9999, 12, 31)},
+])
+def test_too_large_expansions_are_rejected(rule):
+    with pytest.raises(HTTPException) as error:
+        starts(**rule)
+
+    assert error.value.status_code == 400
+
+
+def test_running_past_the_last_date_is_rejected():
+    recurrence = TrainingDateRecurrence(frequency="daily", interval=365, count=2, duration_hours=8,
+                                        first_start=datetime.datetime(9999, 6, 1))
+    with pytest.raises(HTTPException) as error:
+        expand_recurrence(recurrence, 500)
+
+    assert error.value.status_code == 400
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from services.slot_feed import SlotFeed, slot_feed
+
+EVENT = {"id": "date", "training_id": "training", "available_slots": 3}
+
+
+@pytest.mark.asyncio
+async def test_subscribes_only_while_the_stream_runs():
+    feed = SlotFeed(queue_size=10, max_subscribers=1)
+    events = feed.events("training")
+    assert feed.subscribers == set()
+
+    first = asyncio.ensure_future(anext(events))
+    await asyncio.sleep(0)
+    assert len(feed.subscribers) == 1
+    feed.publish({**EVENT, "training_id": "other"})
+    feed.publish(EVENT)
+
+    assert await first == b'event: slots\ndata: {"id":"date","training_id":"training","available_slots":3}\n\n'
+    await events.aclose()
+    assert feed.subscribers == set()
+
+
+@pytest.mark.asyncio
+async def test_capacity_is_checked_without_taking_a_slot():
+    feed = SlotFeed(queue_size=10, max_subscribers=1)
+    feed.check_capacity()
+    feed.check_capacity()
+
+    running = feed.events()
+    waiting = asyncio.ensure_future(anext(running))
+    await asyncio.sleep(0)
+
+    with pytest.raises(HTTPException) as error:
+        feed.check_capacity()
+    assert error.value.status_code == 503
+    # A stream let in before the feed filled up is turned away once it starts
+    assert (await anext(feed.events())).startswith(b"event: unavailable")
+
+    # The client of the running stream disconnects
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert feed.subscribers == set()
+
+
+@pytest.mark.asyncio
+async def test_slow_subscribers_are_evicted():
+    feed = SlotFeed(queue_size=1, max_subscribers=1)
+    events = feed.events()
+    first = asyncio.ensure_future(anext(events))
+    await asyncio.sleep(0)
+    feed.publish(EVENT)
+    feed.publish(EVENT)
+
+    assert (await first).startswith(b"event: slots")
+    assert (await anext(events)).startswith(b"event: evicted")
+    assert feed.subscribers == set()
+    assert feed.stats()["evicted"] == 1
+
+
+def test_full_feed_rejects_streams(client, monkeypatch):
+    monkeypatch.setattr(slot_feed, "max_subscribers", 0)
+
+    response = client.get("/api/v1/training-dates/stream")
+
+    assert response.status_code == 503
+    assert slot_feed.subscribers == set()
@@ -0,0 +1,39 @@
+import orjson
+
+NDJSON = {"accept": "application/x-ndjson"}
+
+
+def insert_trainings(client, database, count: int):
+    async def insert():
+        await database.trainings.insert_many([{"name": f"Training {i}", "price": 100} for i in range(count)])
+
+    client.portal.call(insert)
+
+
+def ndjson_lines(response) -> list[dict]:
+    return [orjson.loads(line) for line in response.content.splitlines()]
+
+
+def test_ndjson_ends_with_next_cursor(client, database):
+    insert_trainings(client, database, 3)
+
+    lines = ndjson_lines(client.get("/api/v1/trainings/?limit=2", headers=NDJSON))
+
+    assert [line["name"] for line in lines[:-1]] == ["Training 0", "Training 1"]
+    assert lines[-1].keys() == {"next_cursor"}
+
+    cursor = lines[-1]["next_cursor"]
+    lines = ndjson_lines(client.get(f"/api/v1/trainings/?limit=2&cursor={cursor}", headers=NDJSON))
+
+    assert [line["name"] for line in lines[:-1]] == ["Training 2"]
+    assert lines[-1] == {"next_cursor": None}
+
+
+def test_streamed_envelope_matches_the_page(client, database):
+    insert_trainings(client, database, 3)
+
+    streamed = client.get("/api/v1/trainings/?limit=2&stream=true").json()
+    page = client.get("/api/v1/trainings/?limit=2").json()
+
+    assert streamed == page
+    assert streamed["next_cursor"] is not None
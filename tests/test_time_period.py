@@ -0,0 +1,56 @@
+import datetime
+
+from services.schedule_service import MAX_SESSION_LENGTH, session_error
+
+DAY = datetime.timedelta(days=1)
+PERIOD_START = datetime.datetime(2026, 3, 1)
+
+
+def insert_dates(client, database, sessions: dict) -> dict:
+    """sessions: training name -> list of (start, end). Returns the training ids by name."""
+    async def insert():
+        ids = {}
+        for name, dates in sessions.items():
+            ids[name] = (await database.trainings.insert_one({"name": name, "price": 100})).inserted_id
+            await database.training_dates.insert_many([
+                {"training_id": ids[name], "start_date": start, "end_date": end, "location": "Online",
+                 "available_slots": 10} for start, end in dates
+            ])
+        return ids
+
+    return client.portal.call(insert)
+
+
+def names_in_period(client, start: datetime.datetime, end: datetime.datetime, limit: int = 100) -> list[str]:
+    response = client.get("/api/v1/trainings/time-period",
+                          params={"start_date": start.isoformat(), "end_date": end.isoformat(), "limit": limit})
+    assert response.status_code == 200
+    return sorted(training["name"] for training in response.json()["data"])
+
+
+def test_dates_overlapping_the_period(client, database):
+    insert_dates(client, database, {
+        "inside": [(PERIOD_START + DAY, PERIOD_START + 2 * DAY)],
+        "across the start": [(PERIOD_START - 2 * DAY, PERIOD_START + DAY)],
+        "longest session": [(PERIOD_START - MAX_SESSION_LENGTH, PERIOD_START)],
+        "before": [(PERIOD_START - 3 * DAY, PERIOD_START - 2 * DAY)],
+        "after": [(PERIOD_START + 8 * DAY, PERIOD_START + 9 * DAY)],
+    })
+
+    assert names_in_period(client, PERIOD_START, PERIOD_START + 7 * DAY) == [
+        "across the start", "inside", "longest session",
+    ]
+
+
+def test_limit_keeps_the_earliest_trainings(client, database):
+    insert_dates(client, database, {
+        f"training {day}": [(PERIOD_START + day * DAY, PERIOD_START + (day + 1) * DAY)] for day in range(5)
+    })
+
+    assert names_in_period(client, PERIOD_START, PERIOD_START + 7 * DAY, limit=2) == ["training 0", "training 1"]
+
+
+def test_session_length_is_bounded():
+    assert session_error(PERIOD_START, PERIOD_START + MAX_SESSION_LENGTH) is None
+    assert session_error(PERIOD_START, PERIOD_START) == "Start date must be before end date"
+    assert session_error(PERIOD_START, PERIOD_START + MAX_SESSION_LENGTH + DAY).startswith("A training date cannot")
@@ -0,0 +1,38 @@
+import datetime
+
+from services.token_service import RevocationList
+from utils.database import tokens_collection
+
+
+def test_stats_of_an_empty_filter(client):
+    revocations = RevocationList()
+
+    async def load():
+        await tokens_collection.delete_many({})
+        await revocations.load()
+
+    client.portal.call(load)
+    stats = revocations.stats()
+
+    assert stats["ready"] is True
+    assert stats["revoked_tokens"] == 0
+    assert stats["capacity"] > 0
+    assert stats["filter_bytes"] == len(revocations.filter.bits)
+
+
+def test_load_adds_every_revoked_token(client):
+    revocations = RevocationList()
+    expires_at = datetime.datetime.now(datetime.UTC) + datetime.timedelta(days=1)
+    keys = [f"jti-{i}" for i in range(2000)]
+
+    async def load():
+        await tokens_collection.delete_many({})
+        await tokens_collection.insert_many([{"_id": key, "expires_at": expires_at} for key in keys])
+        await revocations.load()
+        await tokens_collection.delete_many({})
+
+    client.portal.call(load)
+
+    assert len(revocations.filter) == len(keys)
+    assert all(key in revocations.filter for key in keys)
+    assert revocations.stats()["revoked_tokens"] == len(keys)
@@ -0,0 +1,60 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Fixed-size set of strings that answers `in` without false negatives. False positives happen at about
+    `error_rate` once `capacity` items have been added, and more often beyond that.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # Double hashing: k positions from the two halves of a single digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> bool:
+        """Add an item. Returns False if it was (probably) in the filter already."""
+        added = False
+        for position in self._positions(item):
+            byte, bit = position >> 3, 1 << (position & 7)
+            if not self.bits[byte] & bit:
+                self.bits[byte] |= bit
+                added = True
+        self.count += added
+        return added
+
+    def update(self, items) -> int:
+        """Add many items, e.g. in a worker thread while nothing else uses the filter. Returns how many were new."""
+        bits, size, hashes, blake2b = self.bits, self.size, self.hashes, hashlib.blake2b
+        added = 0
+        for item in items:
+            digest = blake2b(item.encode(), digest_size=16).digest()
+            h1 = int.from_bytes(digest[:8], "little")
+            h2 = int.from_bytes(digest[8:], "little") | 1
+            new = False
+            for i in range(hashes):
+                position = (h1 + i * h2) % size
+                byte, bit = position >> 3, 1 << (position & 7)
+                if not bits[byte] & bit:
+                    bits[byte] |= bit
+                    new = True
+            added += new
+        self.count += added
+        return added
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def __len__(self) -> int:
+        return self.count
@@ -16,14 +16,74 @@ class Settings:
     ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
     REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7))
     MONGO_URI = os.getenv("MONGO_URI", "mongodb://mongo:27017")
+    MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "training_provider_app")
+    # Client options; they override the same options given in MONGO_URI. 0 disables a timeout, except server
+    # selection, which the driver always limits: 0 there fails at once without a reachable server
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 10))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300000))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 30000))
+    MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")  # e.g. zstd,snappy,zlib; zstd and snappy need extra packages
+    # Index builds and migrations run far longer than a request and get this budget instead of the socket timeout
+    MONGO_MAINTENANCE_TIMEOUT_SECONDS = int(os.getenv("MONGO_MAINTENANCE_TIMEOUT_SECONDS", 6 * 60 * 60))
+    # Public catalog reads (trainings, training dates, availability); bookings and all writes use the primary
+    MONGO_CATALOG_READ_PREFERENCE = os.getenv("MONGO_CATALOG_READ_PREFERENCE", "primary")
+    MONGO_CATALOG_READ_CONCERN = os.getenv("MONGO_CATALOG_READ_CONCERN", "")  # empty for the server default
+    MONGO_CATALOG_MAX_STALENESS_SECONDS = int(os.getenv("MONGO_CATALOG_MAX_STALENESS_SECONDS", -1))
     REDIS_URL = os.getenv("REDIS_URL", "redis://redis:6379")
     SMTP_SERVER = os.getenv("SMTP_SERVER")
     SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
     EMAIL_USERNAME = os.getenv("EMAIL_USERNAME")
     EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
+    SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+    SMTP_TIMEOUT_SECONDS = int(os.getenv("SMTP_TIMEOUT_SECONDS", 30))
+    EMAIL_POOL_SIZE = int(os.getenv("EMAIL_POOL_SIZE", 2))
+    EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 50))
+    EMAIL_MAX_PER_MINUTE = int(os.getenv("EMAIL_MAX_PER_MINUTE", 100))
+    EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 8))
+    EMAIL_RETRY_BASE_SECONDS = int(os.getenv("EMAIL_RETRY_BASE_SECONDS", 30))
+    EMAIL_POLL_SECONDS = int(os.getenv("EMAIL_POLL_SECONDS", 5))
+    EMAIL_OUTBOX_RETENTION_DAYS = int(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", 30))
     ACCESS_LIMIT = os.getenv("ACCESS_LIMIT", "10000/seconds")
-    MAX_GET_LIMIT = os.getenv("MAX_GET_LIMIT", "10000")
-    DEFAULT_GET_LIMIT = os.getenv("DEFAULT_GET_LIMIT", "1000")
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text or json, for the console; log files are always JSON
+    LOG_DIR = os.getenv("LOG_DIR", "logs")  # empty to log to the console only
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 5))
+    LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+    LOG_DUPLICATE_INTERVAL_SECONDS = int(os.getenv("LOG_DUPLICATE_INTERVAL_SECONDS", 60))
+    LOG_DUPLICATE_BURST = int(os.getenv("LOG_DUPLICATE_BURST", 5))
+    RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", REDIS_URL)
+    RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "moving-window")
+    MAX_GET_LIMIT = int(os.getenv("MAX_GET_LIMIT", 10000))
+    DEFAULT_GET_LIMIT = int(os.getenv("DEFAULT_GET_LIMIT", 1000))
+    STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 500))
+    SSE_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", 100))  # undelivered events before a stream is evicted
+    SSE_MAX_SUBSCRIBERS = int(os.getenv("SSE_MAX_SUBSCRIBERS", 1000))  # open streams per worker
+    SSE_HEARTBEAT_SECONDS = int(os.getenv("SSE_HEARTBEAT_SECONDS", 15))
+    COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+    # Bodies from this size on are encoded in a worker thread instead of on the event loop
+    COMPRESSION_OFFLOAD_BYTES = int(os.getenv("COMPRESSION_OFFLOAD_BYTES", 64 * 1024))
+    GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 6))
+    BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", 4))
+    MAX_BULK_TRAINING_DATES = int(os.getenv("MAX_BULK_TRAINING_DATES", 500))
+    MAX_SESSION_DAYS = int(os.getenv("MAX_SESSION_DAYS", 31))  # longest a training date may last
+    MAX_BATCH_BOOKINGS = int(os.getenv("MAX_BATCH_BOOKINGS", 100))
+    CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", 1024))
+    CATALOG_CACHE_TTL_SECONDS = int(os.getenv("CATALOG_CACHE_TTL_SECONDS", 30))
+    PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", 10000))
+    PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 60))
+    TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))
+    JWT_BACKEND = os.getenv("JWT_BACKEND", "jose")  # jose or pyjwt (needs PyJWT installed)
+    ROLE_POLL_INTERVAL_SECONDS = int(os.getenv("ROLE_POLL_INTERVAL_SECONDS", 30))
+    REVOKED_TOKEN_SYNC_SECONDS = int(os.getenv("REVOKED_TOKEN_SYNC_SECONDS", 5))
+    REVOKED_TOKEN_FILTER_CAPACITY = int(os.getenv("REVOKED_TOKEN_FILTER_CAPACITY", 1000000))
+    REVOKED_TOKEN_FILTER_ERROR_RATE = float(os.getenv("REVOKED_TOKEN_FILTER_ERROR_RATE", 0.001))
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 64))
 
 
 settings = Settings()
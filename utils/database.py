@@ -1,9 +1,53 @@
+import logging
+
 import motor.motor_asyncio
+import pymongo
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
 
 from utils.config import settings
+from utils.metrics import CommandMetrics, PoolMetrics
+
+logger = logging.getLogger(__name__)
+
+
+
+def _milliseconds(value: int):
+    # 0 in the settings means no limit, which the driver spells None
+    return value or None
+
+
+def client_options() -> dict:
+    options = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "maxIdleTimeMS": _milliseconds(settings.MONGO_MAX_IDLE_TIME_MS),
+        "waitQueueTimeoutMS": _milliseconds(settings.MONGO_WAIT_QUEUE_TIMEOUT_MS),
+        # The driver rejects None here, so this one cannot be disabled
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": _milliseconds(settings.MONGO_CONNECT_TIMEOUT_MS),
+        "socketTimeoutMS": _milliseconds(settings.MONGO_SOCKET_TIMEOUT_MS),
+        "appname": settings.TITLE,
+    }
+    if settings.MONGO_COMPRESSORS:
+        options["compressors"] = settings.MONGO_COMPRESSORS
+    return options
+
 
-client = motor.motor_asyncio.AsyncIOMotorClient(settings.MONGO_URI)
-db = client["training_provider_app"]
+def catalog_read_options() -> dict:
+    mode = read_pref_mode_from_name(settings.MONGO_CATALOG_READ_PREFERENCE)
+    return {
+        "read_preference": make_read_preference(mode, None, settings.MONGO_CATALOG_MAX_STALENESS_SECONDS),
+        "read_concern": ReadConcern(settings.MONGO_CATALOG_READ_CONCERN or None),
+    }
+
+
+# Command latencies and pool waits are exposed on /api/metrics
+client = motor.motor_asyncio.AsyncIOMotorClient(settings.MONGO_URI, event_listeners=[CommandMetrics(), PoolMetrics()],
+                                                **client_options())
+db = client[settings.MONGO_DB_NAME]
 
 users_collection = db["users"]
 roles_collection = db["roles"]
@@ -11,3 +55,172 @@ tokens_collection = db["revoked_tokens"]
 trainings_collection = db["trainings"]
 training_dates_collection = db["training_dates"]
 bookings_collection = db["bookings"]
+migrations_collection = db["migrations"]
+availability_collection = db["availability"]
+outbox_collection = db["email_outbox"]
+
+# Handles for the public catalog reads, which may be routed to secondaries. Everything that writes,
+# and every read that a write depends on (slot checks, bookings), keeps using the handles above
+_catalog_read = catalog_read_options()
+catalog_trainings_collection = trainings_collection.with_options(**_catalog_read)
+catalog_training_dates_collection = training_dates_collection.with_options(**_catalog_read)
+catalog_availability_collection = availability_collection.with_options(**_catalog_read)
+
+# Index registry: one entry per hot query shape. Applied by ensure_indexes() on startup.
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "roles": [
+        IndexModel([("name", ASCENDING)], name="name_unique", unique=True),
+    ],
+    "revoked_tokens": [
+        # Revoked tokens are keyed by jti in _id. A refresh token is useless once expired,
+        # so its revocation entry goes at the token's own expiry
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        # Incremental sync of the revocation filter
+        IndexModel([("revoked_at", ASCENDING)], name="revoked_at"),
+    ],
+    "trainings": [
+        IndexModel([("name", ASCENDING)], name="name_unique", unique=True),
+    ],
+    "training_dates": [
+        IndexModel([("training_id", ASCENDING), ("start_date", ASCENDING), ("_id", ASCENDING)],
+                   name="training_id_start_date_id"),
+        IndexModel([("start_date", ASCENDING), ("_id", ASCENDING)], name="start_date_id"),
+        # Covers the period overlap query of /trainings/time-period
+        IndexModel([("start_date", ASCENDING), ("end_date", ASCENDING), ("training_id", ASCENDING)],
+                   name="start_date_end_date_training_id"),
+    ],
+    "bookings": [
+        IndexModel([("training_date_id", ASCENDING), ("customer_email", ASCENDING)],
+                   name="training_date_id_customer_email_unique", unique=True),
+        IndexModel([("training_date_id", ASCENDING), ("_id", ASCENDING)], name="training_date_id_id"),
+        IndexModel([("customer_email", ASCENDING), ("_id", ASCENDING)], name="customer_email_id"),
+    ],
+    "availability": [
+        IndexModel([("granularity", ASCENDING), ("period", ASCENDING), ("training_id", ASCENDING),
+                    ("location", ASCENDING)], name="granularity_period_training_id_location_unique", unique=True),
+    ],
+    "email_outbox": [
+        # Due mails, and mails whose worker lease ran out
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+        IndexModel([("status", ASCENDING), ("locked_until", ASCENDING)], name="status_locked_until"),
+        IndexModel([("sent_at", ASCENDING)], name="sent_at_ttl",
+                   expireAfterSeconds=settings.EMAIL_OUTBOX_RETENTION_DAYS * 24 * 60 * 60),
+    ],
+}
+
+# Indexes that were replaced and are dropped by ensure_indexes()
+RETIRED_INDEXES = {
+    "revoked_tokens": ["token_unique", "revoked_at_ttl"],
+}
+
+# Server error codes raised when an index with the same name or keys exists with other options
+INDEX_CONFLICT_CODES = (85, 86)
+# Server error code of dropping an index that does not exist
+INDEX_NOT_FOUND_CODE = 27
+
+
+def maintenance_timeout():
+    """
+    Time budget for index builds and migrations. Inside it the driver bounds the whole operation
+    instead of applying the socket timeout to each reply, which a long index build would exceed.
+    """
+    return pymongo.timeout(settings.MONGO_MAINTENANCE_TIMEOUT_SECONDS)
+
+
+async def ensure_indexes():
+    """Create all registered indexes. Safe to call on every startup."""
+    with maintenance_timeout():
+        await _ensure_indexes()
+
+
+async def _conflicting_index(collection, index: IndexModel) -> dict:
+    """The existing index that blocks `index`: one with its name (86) or with its keys under another name (85)."""
+    name, keys = index.document["name"], list(index.document["key"].items())
+    async for existing in collection.list_indexes():
+        if existing["name"] == name or list(existing["key"].items()) == keys:
+            return existing
+    return None
+
+
+def _as_index_model(existing: dict) -> IndexModel:
+    options = {key: value for key, value in existing.items() if key not in ("key", "v", "ns")}
+    return IndexModel(list(existing["key"].items()), **options)
+
+
+async def _rebuild_index(collection, index: IndexModel):
+    """Replace the conflicting index with `index`, and put it back if the new one cannot be built."""
+    label = f"{collection.name}.{index.document['name']}"
+    existing = await _conflicting_index(collection, index)
+    if existing is None:
+        logger.error(f"[Database] Could not create index {label}: no conflicting index found to replace.")
+        return
+    logger.info(f"[Database] Rebuilding index {label} (replacing {existing['name']}) with new options.")
+    await collection.drop_index(existing["name"])
+    try:
+        await collection.create_indexes([index])
+    except OperationFailure as e:
+        # e.g. a unique index over existing duplicates: keep serving with the old definition
+        logger.error(f"[Database] Could not rebuild index {label}, restoring {existing['name']}: {e}")
+        try:
+            await collection.create_indexes([_as_index_model(existing)])
+        except OperationFailure as e:
+            logger.error(f"[Database] Could not restore index {collection.name}.{existing['name']}: {e}")
+
+
+async def _ensure_indexes():
+    for collection_name, names in RETIRED_INDEXES.items():
+        for name in names:
+            try:
+                await db[collection_name].drop_index(name)
+                logger.info(f"[Database] Dropped retired index {collection_name}.{name}.")
+            except OperationFailure as e:
+                if e.code != INDEX_NOT_FOUND_CODE:
+                    logger.error(f"[Database] Could not drop retired index {collection_name}.{name}: {e}")
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        for index in indexes:
+            name = index.document["name"]
+            try:
+                await collection.create_indexes([index])
+            except OperationFailure as e:
+                if e.code not in INDEX_CONFLICT_CODES:
+                    logger.error(f"[Database] Could not create index {collection_name}.{name}: {e}")
+                    continue
+                # The definition changed since it was first created, so replace it
+                try:
+                    await _rebuild_index(collection, index)
+                except OperationFailure as e:
+                    logger.error(f"[Database] Could not rebuild index {collection_name}.{name}: {e}")
+    logger.info("[Database] Indexes ensured.")
+
+
+async def get_index_stats():
+    """Return definition, size and usage statistics of every index of the registered collections."""
+    report = []
+    for collection_name in INDEXES:
+        collection = db[collection_name]
+        sizes = {}
+        async for stats in collection.aggregate([{"$collStats": {"storageStats": {}}}]):
+            sizes.update(stats.get("storageStats", {}).get("indexSizes", {}))
+        usage = {}
+        async for stats in collection.aggregate([{"$indexStats": {}}]):
+            usage[stats["name"]] = stats.get("accesses", {})
+
+        async for index in collection.list_indexes():
+            definition = dict(index)
+            name = definition.pop("name")
+            definition.pop("v", None)
+            definition["key"] = dict(definition["key"])
+            accesses = usage.get(name, {})
+            report.append({
+                "collection": collection_name,
+                "name": name,
+                "definition": definition,
+                "size_bytes": sizes.get(name, 0),
+                "ops": accesses.get("ops", 0),
+                "since": accesses.get("since"),
+            })
+    return report
@@ -0,0 +1,159 @@
+import asyncio
+import gzip
+
+import brotli
+import msgpack
+import orjson
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.config import settings
+
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+# Encodings we can produce, preferred first when the client accepts both equally
+ENCODINGS = ("br", "gzip")
+COMPRESSIBLE_TYPES = ("application/json", "application/msgpack", "text/")
+
+
+def parse_qualities(header: str) -> dict:
+    """`gzip, br;q=0.5` -> {"gzip": 1.0, "br": 0.5}"""
+    qualities = {}
+    for part in header.split(","):
+        name, _, params = part.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+    return qualities
+
+
+def negotiate_encoding(accept_encoding: str) -> str:
+    """The content coding to use for a client sending this Accept-Encoding, or None for identity."""
+    qualities = parse_qualities(accept_encoding)
+    fallback = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for encoding in ENCODINGS:
+        quality = qualities.get(encoding, fallback)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def wants_msgpack(accept: str) -> bool:
+    qualities = parse_qualities(accept)
+    return any(qualities.get(media_type, 0.0) > 0 for media_type in MSGPACK_MEDIA_TYPES)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.BROTLI_QUALITY)
+    # mtime=0 keeps the output of equal bodies byte for byte equal
+    return gzip.compress(body, compresslevel=settings.GZIP_LEVEL, mtime=0)
+
+
+def json_to_msgpack(body: bytes) -> bytes:
+    return msgpack.packb(orjson.loads(body))
+
+
+def encode_body(body: bytes, to_msgpack: bool, encoding: str) -> tuple[bytes, str]:
+    """Convert a JSON body to MessagePack and compress it if it is large enough. Returns the body and its coding."""
+    if to_msgpack:
+        body = json_to_msgpack(body)
+    if encoding and len(body) >= settings.COMPRESSION_MIN_BYTES:
+        return compress(body, encoding), encoding
+    return body, None
+
+
+def etag_suffix(to_msgpack: bool, encoding: str) -> str:
+    return ("-msgpack" if to_msgpack else "") + (f"-{encoding}" if encoding else "")
+
+
+def _add_vary(headers: MutableHeaders, *names: str):
+    vary = [value.strip() for value in headers.get("vary", "").split(",") if value.strip()]
+    vary += [name for name in names if name not in vary]
+    headers["vary"] = ", ".join(vary)
+
+
+class ContentNegotiationMiddleware:
+    """
+    Encode responses of known length the way the client asked for: JSON bodies as MessagePack for
+    `Accept: application/msgpack`, and compressed with brotli or gzip per Accept-Encoding once they reach
+    COMPRESSION_MIN_BYTES. Large bodies are encoded in a worker thread so the event loop keeps serving.
+    Streamed responses (no Content-Length) pass through untouched. The ETag gets a suffix per representation, which is removed
+    from If-None-Match again so the routes' conditional requests keep working.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""))
+        to_msgpack = wants_msgpack(request_headers.get("accept", ""))
+        suffix = etag_suffix(to_msgpack, encoding)
+        if suffix and "if-none-match" in request_headers:
+            scope = dict(scope)
+            scope["headers"] = [
+                (key, value.replace(f'{suffix}"'.encode(), b'"') if key == b"if-none-match" else value)
+                for key, value in scope["headers"]
+            ]
+        start = None
+        chunks = []
+
+        async def negotiated_send(message: Message):
+            nonlocal start
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                media_type = headers.get("content-type", "")
+                is_json = media_type.startswith("application/json")
+                compressible = media_type.startswith(COMPRESSIBLE_TYPES) and "content-encoding" not in headers
+                if compressible:
+                    _add_vary(headers, "Accept-Encoding", *(("Accept",) if is_json else ()))
+                etag = headers.get("etag")
+                if etag and suffix and etag.endswith('"') and (compressible or message["status"] == 304):
+                    headers["etag"] = f'{etag[:-1]}{suffix}"'
+                if not compressible or "content-length" not in headers:
+                    # Nothing to encode, or a stream whose chunks should not wait for the end of the response
+                    await send(message)
+                    return
+                # A complete body, possibly sent in chunks by an inner middleware: collect it first
+                start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            chunks.clear()
+            headers = MutableHeaders(raw=start["headers"])
+            convert = to_msgpack and headers["content-type"].startswith("application/json")
+            if body:
+                if len(body) >= settings.COMPRESSION_OFFLOAD_BYTES:
+                    body, coding = await asyncio.to_thread(encode_body, body, convert, encoding)
+                else:
+                    body, coding = encode_body(body, convert, encoding)
+                if convert:
+                    headers["content-type"] = MSGPACK_MEDIA_TYPES[0]
+                if coding:
+                    headers["content-encoding"] = coding
+                headers["content-length"] = str(len(body))
+            await send(start)
+            start = None
+            await send({"type": "http.response.body", "body": body, "more_body": False})
+
+        await self.app(scope, receive, negotiated_send)
@@ -14,8 +14,13 @@ async def global_exception_handler(request: Request, exc: Exception):
 
 
 async def http_exception_handler(request: Request, exc: HTTPException):
-    logger.error(f"An unexpected http error occurred: {exc}", exc_info=True)
+    # Client errors (401, 403, 404, ...) are part of normal operation: no traceback, and below the error logs
+    if exc.status_code >= 500:
+        logger.error(f"An http error occurred: {exc}", exc_info=True)
+    else:
+        logger.info(f"Request rejected: {exc}")
     return JSONResponse(
         status_code=exc.status_code,
         content={"message": exc.detail},
+        headers=exc.headers,
     )
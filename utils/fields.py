@@ -0,0 +1,31 @@
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+
+# Returned whatever the client asks for
+ALWAYS_INCLUDED = ("id",)
+
+
+def field_projection(fields: str, model: type[BaseModel]) -> dict:
+    """
+    Turn a comma separated `fields` parameter into an inclusion projection, checked against the fields of `model`.
+    Returns None when no fields were asked for, i.e. whole documents.
+    """
+    if not fields:
+        return None
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in model.model_fields]
+    if unknown:
+        allowed = ", ".join(name for name in model.model_fields if name not in ALWAYS_INCLUDED)
+        raise HTTPException(status_code=400, detail=f"Unknown field(s): {', '.join(unknown)}. Available: {allowed}")
+    return {name: 1 for name in (*ALWAYS_INCLUDED, *requested)}
+
+
+def sparse_fields(model: type[BaseModel]):
+    """Dependency reading the `fields` query parameter of a list endpoint returning `model` rows."""
+    available = ", ".join(name for name in model.model_fields if name not in ALWAYS_INCLUDED)
+
+    def dependency(fields: str = Query(None, description=f"Comma separated fields to return, of: {available}. "
+                                                         "id is always returned")) -> dict:
+        return field_projection(fields, model)
+
+    return dependency
@@ -1,16 +1,21 @@
 from typing import Any
 
 from bson import ObjectId
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt, JWTError
+from jose import JWTError
 
 from models.user import UserDB
+from utils.cache import TTLCache
 from utils.config import settings
 from utils.database import users_collection
+from utils.token_decoder import access_tokens
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="v1/auth/login")
 
+# Resolved users by id, shared by all requests of this worker
+user_cache = TTLCache(maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
 
 def convert_objectid_to_str(data: Any) -> Any:
     if isinstance(data, dict):
@@ -22,15 +27,35 @@ def convert_objectid_to_str(data: Any) -> Any:
     return data
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+def parse_object_id(value: str, name: str = "id") -> ObjectId:
+    """The ObjectId of an id sent by the client, or a 400 instead of the error of bson."""
+    if not ObjectId.is_valid(value):
+        raise HTTPException(status_code=400, detail=f"Invalid {name}")
+    return ObjectId(value)
+
+
+def invalidate_user(user_id: str):
+    user_cache.pop(user_id)
+
+
+async def get_current_user(request: Request, token: str = Depends(oauth2_scheme)):
+    """
+    Resolve the user of the bearer token. FastAPI caches dependencies per request, so every
+    `Depends(get_current_user)` of a request (including the one in check_permission) shares one call.
+    The verified claims are shared with the rate limiter through the request.
+    """
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id = payload.get("sub")
-        user = await users_collection.find_one({"_id": ObjectId(user_id)})
-        user = convert_objectid_to_str(user)
-        user["id"] = user["_id"]
-        del user["_id"]
-        return UserDB(**user)
+        payload = access_tokens.decode_request(request, token)
     except JWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
-
+    user_id = payload.get("sub")
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await users_collection.find_one({"_id": ObjectId(user_id)})
+        if not user:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        user["id"] = str(user.pop("_id"))
+        user = UserDB(**user)
+        user_cache.set(user_id, user)
+    request.state.user = user
+    return user
@@ -1,49 +1,163 @@
+import copy
+import json
 import logging
-from logging.config import dictConfig
+import os
+import queue
+import sys
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from uvicorn.logging import DefaultFormatter
+
+from utils.config import settings
+
+# Set by RequestContextMiddleware for the duration of a request
+request_context: ContextVar[dict] = ContextVar("request_context", default={})
+
+# Record attributes passed with `extra=` that end up in the JSON output
+EXTRA_FIELDS = ("request_id", "method", "route", "path", "status", "latency_ms")
+
+_listener: QueueListener = None
+_traceback_formatter = logging.Formatter()
+
+
+class ContextFilter(logging.Filter):
+    """
+    Copy the current request context onto the record. Runs on the logging thread of the caller,
+    before the record is queued, because the listener thread cannot see the request's context.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for key, value in request_context.get().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class DuplicateFilter(logging.Filter):
+    """
+    Let at most `burst` identical warnings or errors through per `interval` seconds. The next one that passes
+    reports how many were dropped, so an error storm costs one log line per interval instead of one per request.
+    """
+
+    def __init__(self, interval: float, burst: int, maxsize: int = 1000):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self.maxsize = maxsize
+        self._windows: dict = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        started, count, suppressed = self._windows.get(key, (now, 0, 0))
+        if now - started >= self.interval:
+            started, count = now, 0
+        if count >= self.burst:
+            self._windows[key] = (started, count, suppressed + 1)
+            return False
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} identical messages suppressed)"
+            record.args = None
+        if len(self._windows) >= self.maxsize and key not in self._windows:
+            self._windows.clear()
+        self._windows[key] = (started, count + 1, 0)
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Drops records when the queue is full instead of blocking the event loop on a slow disk or terminal."""
+
+    dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the message and traceback on the calling thread, but keep them apart for the JSON formatter;
+        # the exception object itself is dropped, it holds on to the frames of the request
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _traceback_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+def _console_formatter() -> logging.Formatter:
+    if settings.LOG_FORMAT == "json":
+        return JSONFormatter()
+    return DefaultFormatter(fmt="%(levelprefix)s %(asctime)s | %(name)s | %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+
 
 def setup_logging():
-    logging_config = {
-        "version": 1,
-        "disable_existing_loggers": False,
-        "formatters": {
-            "default": {
-                "()": "uvicorn.logging.DefaultFormatter",
-                "fmt": "%(levelprefix)s %(asctime)s | %(name)s | %(message)s",
-                "datefmt": "%Y-%m-%d %H:%M:%S",
-            },
-            "error": {
-                "format": "[%(asctime)s] %(levelname)s in %(module)s: %(message)s"
-            }
-        },
-        "handlers": {
-            "default": {
-                "formatter": "default",
-                "class": "logging.StreamHandler",
-                "stream": "ext://sys.stdout",
-            },
-            "error_file": {
-                "level": "ERROR",
-                "formatter": "error",
-                "class": "logging.FileHandler",
-                "filename": "errors.log",
-            }
-        },
-        "root": {
-            "handlers": ["default", "error_file"],
-            "level": "INFO",
-        },
-        "loggers": {
-            "uvicorn.error": {
-                "level": "INFO",
-                "handlers": ["default", "error_file"],
-                "propagate": False,
-            },
-            "uvicorn.access": {
-                "handlers": ["default"],
-                "level": "INFO",
-                "propagate": False,
-            },
-        },
-    }
-
-    dictConfig(logging_config)
+    """
+    Route all records through a bounded queue to a listener thread that does the actual writing:
+    the console, a rotating JSON log of everything and a rotating log of errors.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(_console_formatter())
+    handlers = [console]
+    if settings.LOG_DIR:
+        os.makedirs(settings.LOG_DIR, exist_ok=True)
+        for filename, level in (("app.log", logging.INFO), ("errors.log", logging.ERROR)):
+            file_handler = RotatingFileHandler(os.path.join(settings.LOG_DIR, filename), maxBytes=settings.LOG_MAX_BYTES,
+                                               backupCount=settings.LOG_BACKUP_COUNT, encoding="utf-8", delay=True)
+            file_handler.setLevel(level)
+            file_handler.setFormatter(JSONFormatter())
+            handlers.append(file_handler)
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.LOG_QUEUE_SIZE))
+    queue_handler.addFilter(ContextFilter())
+    queue_handler.addFilter(DuplicateFilter(settings.LOG_DUPLICATE_INTERVAL_SECONDS, settings.LOG_DUPLICATE_BURST))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(settings.LOG_LEVEL)
+    # Uvicorn configures its own handlers; send its records through the queue as well
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+
+    _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Write out the queued records and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
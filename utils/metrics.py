@@ -0,0 +1,199 @@
+import bisect
+import threading
+
+from pymongo import monitoring
+
+# Prometheus' default latency buckets, and finer ones for database round trips
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+DATABASE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+REGISTRY: list = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """
+    Minimal Prometheus metric: values per label tuple, rendered in the text exposition format.
+    Updated from the event loop and from pymongo's threads, hence the lock.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = labels
+        self._values: dict = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield f"{self.name}{_labels(self.label_names, labels)} {value}"
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = REQUEST_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # Per bucket counts (the last one is +Inf), sum
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def count(self) -> int:
+        """Observations over all label values."""
+        with self._lock:
+            return sum(sum(counts) for counts, _ in self._values.values())
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}"
+
+
+http_requests = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+http_request_duration = Histogram("http_request_duration_seconds", "HTTP request latency by route.",
+                                  ("method", "route"))
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests being handled.")
+rate_limit_rejections = Counter("rate_limit_rejections_total", "Requests rejected by the rate limiter.", ("route",))
+
+mongodb_command_duration = Histogram("mongodb_command_duration_seconds", "MongoDB command latency.",
+                                     ("collection", "command"), DATABASE_BUCKETS)
+mongodb_command_failures = Counter("mongodb_command_failures_total", "Failed MongoDB commands.",
+                                   ("collection", "command"))
+mongodb_pool_checkout_wait = Histogram("mongodb_pool_checkout_wait_seconds",
+                                       "Time spent waiting for a pooled connection.", ("address",), DATABASE_BUCKETS)
+mongodb_pool_checkout_failures = Counter("mongodb_pool_checkout_failures_total",
+                                         "Connection checkouts that failed, e.g. on a wait queue timeout.",
+                                         ("address", "reason"))
+mongodb_pool_connections = Gauge("mongodb_pool_connections", "Open pooled connections.", ("address",))
+mongodb_pool_checked_out = Gauge("mongodb_pool_checked_out_connections", "Connections in use.", ("address",))
+
+
+def record_request(method: str, route: str, status: int, seconds: float):
+    http_requests.inc(method, route, status)
+    http_request_duration.observe(seconds, method, route)
+
+
+def render() -> str:
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Latency and failures of every command, by collection and command name."""
+
+    def __init__(self):
+        # The success and failure events do not carry the command, so remember its collection until then
+        self._collections: dict = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        self._collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else ""
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        mongodb_command_duration.observe(event.duration_micros / 1e6, collection, event.command_name)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        mongodb_command_duration.observe(event.duration_micros / 1e6, collection, event.command_name)
+        mongodb_command_failures.inc(collection, event.command_name)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool size, connections in use and how long requests wait for one."""
+
+    def connection_checked_out(self, event):
+        mongodb_pool_checkout_wait.observe(event.duration or 0.0, _address(event))
+        mongodb_pool_checked_out.inc(_address(event))
+
+    def connection_checked_in(self, event):
+        mongodb_pool_checked_out.dec(_address(event))
+
+    def connection_check_out_failed(self, event):
+        mongodb_pool_checkout_wait.observe(event.duration or 0.0, _address(event))
+        mongodb_pool_checkout_failures.inc(_address(event), event.reason)
+
+    def connection_created(self, event):
+        mongodb_pool_connections.inc(_address(event))
+
+    def connection_closed(self, event):
+        mongodb_pool_connections.dec(_address(event))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
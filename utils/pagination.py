@@ -0,0 +1,79 @@
+import base64
+import binascii
+import datetime
+
+from bson import ObjectId, json_util
+from bson.errors import BSONError
+from fastapi import HTTPException
+
+from utils.serialization import is_inclusion, with_string_id
+
+# Type of every sort key the lists page by. Cursor values go into the query as they are, so anything
+# else (an operator document such as {"$ne": null} in particular) is rejected
+SORT_KEY_TYPES = {"_id": ObjectId, "start_date": datetime.datetime}
+
+
+def encode_cursor(document: dict, sort_keys: tuple) -> str:
+    """Opaque cursor pointing right after `document` (as returned by page_pipeline) in `sort_keys` order."""
+    values = [ObjectId(document["id"]) if key == "_id" else document[key] for key in sort_keys]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str, sort_keys: tuple) -> list:
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError, binascii.Error, BSONError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(sort_keys):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    for key, value in zip(sort_keys, values):
+        if not isinstance(value, SORT_KEY_TYPES[key]):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def keyset_query(query: dict, cursor: str, sort_keys: tuple) -> dict:
+    """
+    Restrict `query` to the documents after `cursor`. For keys (a, b) this is
+    a > x or (a == x and b > y), which an index on (..., a, b) answers with a single seek.
+    """
+    if not cursor:
+        return query
+    values = decode_cursor(cursor, sort_keys)
+    branches = []
+    for i, key in enumerate(sort_keys):
+        branch = {sort_keys[j]: values[j] for j in range(i)}
+        branch[key] = {"$gt": values[i]}
+        branches.append(branch)
+    after = branches[0] if len(branches) == 1 else {"$or": branches}
+    return {"$and": [query, after]} if query else after
+
+
+def page_pipeline(query: dict, cursor: str, limit: int, sort_keys: tuple = ("_id",), projection: dict = None) -> list:
+    """
+    Aggregation pipeline for up to `limit` documents after `cursor` in a stable `sort_keys` order.
+    Documents come back with `_id` already converted to a string `id`.
+    """
+    if is_inclusion(projection):
+        # The next cursor is built from the sort keys of the last document
+        projection = {**projection, **{key: 1 for key in sort_keys if key != "_id"}}
+    return [
+        {"$match": keyset_query(query, cursor, sort_keys)},
+        {"$sort": {key: 1 for key in sort_keys}},
+        {"$limit": limit},
+        *with_string_id(projection),
+    ]
+
+
+async def fetch_page(collection, query: dict, cursor: str, limit: int, sort_keys: tuple = ("_id",),
+                     projection: dict = None):
+    """
+    Return one page of documents and the cursor of the next page, or None when this is the last page.
+    """
+    pipeline = page_pipeline(query, cursor, limit + 1, sort_keys, projection)
+    documents = await collection.aggregate(pipeline).to_list(length=limit + 1)
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1], sort_keys)
+    return documents, next_cursor
@@ -1,28 +1,110 @@
-from bson import ObjectId
+import asyncio
+import logging
+
 from fastapi import Depends, HTTPException
+from pymongo.errors import OperationFailure, PyMongoError
 
+from utils.config import settings
 from utils.database import roles_collection
 from models.role import RoleDB
 from utils.helper import convert_objectid_to_str
 from utils.helper import get_current_user
 
+logger = logging.getLogger(__name__)
+
+WILDCARD = "*"
+
+
+class RoleTable:
+    """
+    In-memory copy of the roles collection, compiled to role name -> frozenset of permissions.
+    Kept fresh by watch(), so permission checks never touch the database.
+    """
+
+    def __init__(self):
+        self.permissions: dict[str, frozenset] = {}
+        self.wildcard_roles: frozenset = frozenset()
+        self.reloads = 0
+        self._versions: set = set()
+
+    def compile(self, roles: list[RoleDB]):
+        self.permissions = {role.name: frozenset(role.permissions) for role in roles}
+        self.wildcard_roles = frozenset(role.name for role in roles if WILDCARD in role.permissions)
+
+    async def load(self):
+        roles = []
+        versions = set()
+        async for role_find in roles_collection.find({}):
+            role_find = convert_objectid_to_str(role_find)
+            versions.add((role_find["_id"], role_find["name"], role_find.get("version")))
+            roles.append(RoleDB(**role_find))
+        self.compile(roles)
+        self._versions = versions
+        self.reloads += 1
+        logger.info(f"[Roles] Loaded {len(roles)} roles.")
+
+    def permissions_for(self, roles: list[str]) -> frozenset:
+        return frozenset().union(*(self.permissions.get(role, ()) for role in roles))
+
+    def allows(self, roles: list[str], permission: str) -> bool:
+        if not self.wildcard_roles.isdisjoint(roles):
+            return True
+        return any(permission in self.permissions.get(role, ()) for role in roles)
+
+    async def watch(self):
+        """
+        Reload on every change of the roles collection. Falls back to polling the role versions
+        when change streams are not available (standalone mongod).
+        """
+        while True:
+            try:
+                async with roles_collection.watch() as stream:
+                    # Changes made before the stream was opened would otherwise be missed
+                    await self.load()
+                    async for _ in stream:
+                        await self.load()
+            except OperationFailure as e:
+                logger.info(f"[Roles] Change streams unavailable ({e.code}), polling every "
+                            f"{settings.ROLE_POLL_INTERVAL_SECONDS}s instead.")
+                await self._poll()
+                return
+            except PyMongoError as e:
+                logger.warning(f"[Roles] Role watcher interrupted: {e}")
+                await asyncio.sleep(settings.ROLE_POLL_INTERVAL_SECONDS)
 
-async def get_role_permissions(roles: str):
-    db_roles = []
-    for role in roles:
-        role_find = await roles_collection.find_one({"name": role})
-        role_find = convert_objectid_to_str(role_find)
-        db_roles += RoleDB(**role_find).permissions
-    return db_roles
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(settings.ROLE_POLL_INTERVAL_SECONDS)
+            try:
+                if await self._fetch_versions() != self._versions:
+                    await self.load()
+            except PyMongoError as e:
+                logger.warning(f"[Roles] Polling roles failed: {e}")
+
+    async def _fetch_versions(self) -> set:
+        return {(str(role["_id"]), role["name"], role.get("version"))
+                async for role in roles_collection.find({}, {"name": 1, "version": 1})}
+
+    def stats(self) -> dict:
+        return {"roles": len(self.permissions), "wildcard_roles": sorted(self.wildcard_roles), "reloads": self.reloads}
+
+
+role_table = RoleTable()
 
 
 def check_permission(required_permission: str):
     async def permission_checker(user: dict = Depends(get_current_user)):
-        role_permissions = await get_role_permissions(user.roles)
-        if '*' in role_permissions:
+        if required_permission in user.permissions or role_table.allows(user.roles, required_permission):
             return user
-        if required_permission not in role_permissions and required_permission not in user.permissions:
+        raise HTTPException(status_code=403, detail="Permission denied")
+
+    return permission_checker
+
+
+def require_role(required_role: str):
+    async def role_checker(user: dict = Depends(get_current_user)):
+        if required_role not in user.roles:
             raise HTTPException(status_code=403, detail="Permission denied")
         return user
 
-    return permission_checker
+    return role_checker
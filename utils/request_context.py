@@ -0,0 +1,69 @@
+import logging
+import time
+import uuid
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.logging_config import request_context
+from utils.metrics import http_requests_in_flight, record_request
+
+logger = logging.getLogger("api.requests")
+
+REQUEST_ID_HEADER = "x-request-id"
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Path template of the route handling the request, e.g. /api/v1/bookings/{id}. Requests rejected before
+    routing (by the rate limiter middleware) are matched here.
+    """
+    route = scope.get("route")
+    if route is None:
+        route = next((route for route in scope["app"].routes if route.matches(scope)[0] == Match.FULL), None)
+    return getattr(route, "path", "unmatched")
+
+
+class RequestContextMiddleware:
+    """
+    Give every request an id (taken from X-Request-ID if the client sent one), make it part of every log record
+    written while handling the request, return it in the response, and log and record in the metrics one line
+    per request with route, status and latency. Plain ASGI, so streamed responses pass through untouched.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        request_id = headers.get(REQUEST_ID_HEADER.encode(), b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        token = request_context.set({"request_id": request_id, "method": scope["method"], "path": scope["path"]})
+        status = 500
+        started = time.perf_counter()
+        http_requests_in_flight.inc()
+
+        async def send_with_request_id(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"].append((REQUEST_ID_HEADER.encode(), request_id.encode("latin-1")))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            # The route template rather than the path keeps the number of label values low
+            route = route_template(scope)
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            record_request(scope["method"], route, status, elapsed)
+            latency_ms = round(elapsed * 1000, 2)
+            logger.log(logging.WARNING if status >= 500 else logging.INFO,
+                       f"{scope['method']} {scope['path']} {status} {latency_ms}ms",
+                       extra={"route": route, "status": status, "latency_ms": latency_ms})
+            request_context.reset(token)
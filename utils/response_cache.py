@@ -0,0 +1,72 @@
+import functools
+import hashlib
+from collections import defaultdict
+
+from fastapi import Request, Response
+
+from utils.cache import TTLCache
+from utils.config import settings
+
+
+class ResponseCache:
+    """
+    Cache of rendered GET responses keyed on path, query parameters and Accept header, with strong ETags.
+    Entries are tagged with the collections they were built from; invalidate(tag) bumps the tag's
+    generation so every entry built from the old data stops matching.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.generations = defaultdict(int)
+        self.not_modified = 0
+
+    def invalidate(self, *tags: str):
+        for tag in tags:
+            self.generations[tag] += 1
+
+    def _key(self, request: Request, tags: tuple) -> tuple:
+        return (
+            request.url.path,
+            tuple(sorted(request.query_params.multi_items())),
+            request.headers.get("accept", ""),
+            tuple(self.generations[tag] for tag in tags),
+        )
+
+    def _respond(self, request: Request, entry: tuple) -> Response:
+        body, etag, media_type = entry
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag in request.headers.get("if-none-match", ""):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type=media_type, headers=headers)
+
+    def cached(self, *tags: str):
+        """
+        Decorator for GET routes taking a `request: Request` argument. Streaming and non-200
+        responses are passed through uncached.
+        """
+
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                request = kwargs["request"]
+                key = self._key(request, tags)
+                entry = self.cache.get(key)
+                if entry is None:
+                    response = await func(*args, **kwargs)
+                    if not isinstance(response, Response) or response.status_code != 200 or not hasattr(response, "body"):
+                        return response
+                    etag = '"' + hashlib.blake2b(response.body, digest_size=16).hexdigest() + '"'
+                    entry = (response.body, etag, response.media_type)
+                    self.cache.set(key, entry)
+                return self._respond(request, entry)
+
+            return wrapper
+
+        return decorator
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "not_modified": self.not_modified}
+
+
+catalog_cache = ResponseCache(maxsize=settings.CATALOG_CACHE_SIZE, ttl=settings.CATALOG_CACHE_TTL_SECONDS)
@@ -0,0 +1,44 @@
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode to JSON with orjson; datetimes are handled natively, ObjectIds become strings."""
+    return orjson.dumps(content, default=_default)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response for trusted database rows. Returning it from a route skips the response_model
+    validation, so only use it for documents that already have the response shape.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def is_inclusion(projection: dict) -> bool:
+    return any(value == 1 for key, value in (projection or {}).items() if key != "_id")
+
+
+def with_string_id(projection: dict = None) -> list:
+    """
+    Pipeline stages that replace `_id` with its string form in `id`, applying an exclusion `projection`
+    or an inclusion one (sparse fieldsets), which always keeps `id`.
+    """
+    projection = {**(projection or {}), "_id": 0}
+    if is_inclusion(projection):
+        projection["id"] = 1
+    return [
+        {"$set": {"id": {"$toString": "$_id"}}},
+        {"$project": projection},
+    ]
@@ -0,0 +1,56 @@
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from utils.config import settings
+from utils.pagination import encode_cursor, page_pipeline
+from utils.serialization import dumps
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def wants_stream(request: Request, stream: bool) -> bool:
+    return stream or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def _page_documents(cursor, limit: int, sort_keys: tuple, page: dict):
+    # Read one document ahead so the stream can end with the cursor of the next page
+    count = 0
+    last = None
+    async for document in cursor:
+        if count == limit:
+            page["next_cursor"] = encode_cursor(last, sort_keys)
+            break
+        last = document
+        yield document
+        count += 1
+
+
+async def _ndjson_rows(cursor, limit: int, sort_keys: tuple):
+    page = {"next_cursor": None}
+    async for document in _page_documents(cursor, limit, sort_keys, page):
+        yield dumps(document) + b"\n"
+    yield dumps(page) + b"\n"
+
+
+async def _json_envelope(cursor, limit: int, sort_keys: tuple):
+    yield b'{"status":true,"data":['
+    page = {"next_cursor": None}
+    separator = b""
+    async for document in _page_documents(cursor, limit, sort_keys, page):
+        yield separator + dumps(document)
+        separator = b","
+    yield b'],"next_cursor":' + dumps(page["next_cursor"]) + b"}"
+
+
+def stream_page(request: Request, collection, query: dict, cursor: str, limit: int, sort_keys: tuple = ("_id",),
+                projection: dict = None) -> StreamingResponse:
+    """
+    Stream one page of documents as they arrive from the database, in `settings.STREAM_BATCH_SIZE` batches.
+    Returns NDJSON rows when the client accepts it, closed by a `{"next_cursor": ...}` line, otherwise the
+    regular list envelope as a JSON stream.
+    """
+    pipeline = page_pipeline(query, cursor, limit + 1, sort_keys, projection)
+    documents = collection.aggregate(pipeline, batchSize=settings.STREAM_BATCH_SIZE)
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return StreamingResponse(_ndjson_rows(documents, limit, sort_keys), media_type=NDJSON_MEDIA_TYPE)
+    return StreamingResponse(_json_envelope(documents, limit, sort_keys), media_type="application/json")
@@ -0,0 +1,100 @@
+import hashlib
+import logging
+import time
+
+from jose import jwt, JWTError
+from starlette.requests import Request
+
+from utils.cache import TTLCache
+from utils.config import settings
+
+try:
+    import jwt as pyjwt
+except ImportError:
+    pyjwt = None
+
+logger = logging.getLogger(__name__)
+
+
+def _jose_decode(token: str, secret: str, algorithm: str) -> dict:
+    return jwt.decode(token, secret, algorithms=[algorithm])
+
+
+def _pyjwt_decode(token: str, secret: str, algorithm: str) -> dict:
+    try:
+        return pyjwt.decode(token, secret, algorithms=[algorithm])
+    except pyjwt.PyJWTError as e:
+        raise JWTError(str(e))
+
+
+BACKENDS = {"jose": _jose_decode}
+if pyjwt is not None:
+    BACKENDS["pyjwt"] = _pyjwt_decode
+
+
+class TokenDecoder:
+    """
+    Verifies JWTs and caches the verified claims by token digest until the token expires,
+    so a token is checked once per worker instead of on every request.
+    Raises JWTError for invalid tokens, whatever the backend.
+    """
+
+    def __init__(self, secret: str, algorithm: str, backend: str, maxsize: int):
+        if backend not in BACKENDS:
+            logger.warning(f"[Tokens] JWT backend {backend!r} is not available, using jose.")
+            backend = "jose"
+        self.secret = secret
+        self.algorithm = algorithm
+        self.backend = backend
+        self._decode = BACKENDS[backend]
+        self.cache = TTLCache(maxsize=maxsize, ttl=0)
+        self.decodes = 0
+        self.failures = 0
+        self.decode_seconds = 0.0
+
+    def decode(self, token: str) -> dict:
+        """Verified claims of `token`. The returned dict is shared, do not modify it."""
+        key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        claims = self.cache.get(key)
+        if claims is not None:
+            return claims
+
+        started = time.perf_counter()
+        try:
+            claims = self._decode(token, self.secret, self.algorithm)
+        except JWTError:
+            self.failures += 1
+            raise
+        finally:
+            self.decode_seconds += time.perf_counter() - started
+            self.decodes += 1
+
+        expires_in = claims.get("exp", 0) - time.time()
+        if expires_in > 0:
+            self.cache.set(key, claims, ttl=expires_in)
+        return claims
+
+    def decode_request(self, request: Request, token: str) -> dict:
+        """Like decode(), memoized on the request so its dependencies and the rate limiter share one result."""
+        memo = getattr(request.state, "token_claims", None)
+        if memo is not None and memo[0] == token:
+            return memo[1]
+        claims = self.decode(token)
+        request.state.token_claims = (token, claims)
+        return claims
+
+    def stats(self) -> dict:
+        average = self.decode_seconds / self.decodes if self.decodes else 0.0
+        return {
+            **self.cache.stats(),
+            "backend": self.backend,
+            "decodes": self.decodes,
+            "failures": self.failures,
+            "decode_seconds": self.decode_seconds,
+            "average_decode_microseconds": average * 1e6,
+            # Every cache hit is a decode that did not have to run
+            "saved_seconds": self.cache.hits * average,
+        }
+
+
+access_tokens = TokenDecoder(settings.SECRET_KEY, settings.ALGORITHM, settings.JWT_BACKEND, settings.TOKEN_CACHE_SIZE)